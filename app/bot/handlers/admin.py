@@ -1,17 +1,19 @@
-import csv
-import io
+import asyncio
 import logging
+import os
+from datetime import datetime, timedelta
 from html import escape
 
-from aiogram import Router, F, types
+from aiogram import Bot, Router, F, types
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
-from aiogram.types import BufferedInputFile
+from aiogram.types import FSInputFile
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.config import ADMIN_IDS
-from app.db.base import SessionLocal
+from app.core.config import ADMIN_IDS, ADMIN_PAGE_SIZE
 from app.db import repo, models
+from app.db.export import export_orders_csv
 from app.bot.keyboards.admin import (
     admin_menu_kb,
     products_kb,
@@ -21,6 +23,9 @@ from app.bot.keyboards.admin import (
     order_view_kb,
 )
 from app.bot.states.admin_product import NewProduct, SetPhoto, EditProduct
+from app.bot.outbox import outbox
+from app.bot.media import warm_up
+from app.bot.handlers.catalog import HERO_URL
 
 router = Router()
 log = logging.getLogger("ecombot.admin")
@@ -34,34 +39,55 @@ async def admin_home(message: types.Message):
         return
     await message.answer("Admin panel:", reply_markup=admin_menu_kb())
 
+def _page_nav(offset: int, shown: int, total: int) -> dict:
+    # page number/count + prev/next flags from two COUNTs (offset = rows before this page)
+    return {
+        "page": offset // ADMIN_PAGE_SIZE + 1,
+        "pages": max(1, -(-total // ADMIN_PAGE_SIZE)),
+        "has_prev": offset > 0,
+        "has_next": offset + shown < total,
+    }
+
+async def _products_page_kb(db: AsyncSession, cursor_id: int | None = None, backwards: bool = False):
+    products, _ = await repo.list_products_admin_page(db, cursor_id, backwards, limit=ADMIN_PAGE_SIZE)
+    total = await repo.count_products(db)
+    offset = await repo.count_products(db, products[0].id) if products else 0
+    return products_kb(products, **_page_nav(offset, len(products), total))
+
 # ---------- list products ----------
 @router.callback_query(F.data == "adm:products")
-async def adm_products(cb: types.CallbackQuery):
+async def adm_products(cb: types.CallbackQuery, db: AsyncSession):
     if not _is_admin(cb.from_user.id):
         await cb.answer(); return
-    async with SessionLocal() as db:
-        products = await repo.list_products(db)
-    await cb.message.edit_text("Products:", reply_markup=products_kb(products))
+    await cb.message.edit_text("Products:", reply_markup=await _products_page_kb(db))
+    await cb.answer()
+
+@router.callback_query(F.data.startswith("adm:prodp:"))
+async def adm_products_page(cb: types.CallbackQuery, db: AsyncSession):
+    # adm:prodp:<p|n>:<cursor product id>
+    if not _is_admin(cb.from_user.id):
+        await cb.answer(); return
+    _, _, direction, cursor_id = cb.data.split(":")
+    kb = await _products_page_kb(db, int(cursor_id), backwards=direction == "p")
+    await cb.message.edit_text("Products:", reply_markup=kb)
     await cb.answer()
 
 @router.callback_query(F.data == "adm:nophoto")
-async def adm_products_without_photo(cb: types.CallbackQuery):
+async def adm_products_without_photo(cb: types.CallbackQuery, db: AsyncSession):
     if not _is_admin(cb.from_user.id):
         await cb.answer(); return
-    async with SessionLocal() as db:
-        products = await repo.list_products_without_photo(db)
+    products = await repo.list_products_without_photo(db)
     text = "Products without photo:" if products else "All products have photos ✅"
     await cb.message.edit_text(text, reply_markup=products_kb(products) if products else admin_menu_kb())
     await cb.answer()
 
 @router.callback_query(F.data.startswith("adm:prod:"))
-async def adm_product_view(cb: types.CallbackQuery):
+async def adm_product_view(cb: types.CallbackQuery, db: AsyncSession):
     if not _is_admin(cb.from_user.id):
         await cb.answer(); return
     pid = int(cb.data.split(":")[2])
-    async with SessionLocal() as db:
-        p = await db.get(models.Product, pid)
-        cat = await db.get(models.Category, p.category_id) if p else None
+    p = await db.get(models.Product, pid)
+    cat = await db.get(models.Category, p.category_id) if p else None
 
     if not p:
         await cb.message.edit_text("Product not found.")
@@ -100,42 +126,41 @@ async def adm_edit_field_ask(cb: types.CallbackQuery, state: FSMContext):
     await cb.answer()
 
 @router.message(EditProduct.waiting_value)
-async def adm_edit_field_save(message: types.Message, state: FSMContext):
+async def adm_edit_field_save(message: types.Message, state: FSMContext, db: AsyncSession):
     data = await state.get_data()
     pid = data["product_id"]
     field = data["field"]
     value_raw = message.text.strip()
 
-    async with SessionLocal() as db:
-        if field == "name":
-            if len(value_raw) < 2:
-                await message.answer("Name too short."); return
-            p = await repo.update_product_fields(db, pid, name=value_raw)
-
-        elif field == "price":
-            try:
-                price = float(value_raw.replace(",", "."))
-            except ValueError:
-                await message.answer("Invalid price. Try again."); return
-            p = await repo.update_product_fields(db, pid, price=price)
-
-        elif field == "category":
-            if not value_raw.isdigit():
-                await message.answer("Category ID must be numeric."); return
-            cid = int(value_raw)
-            cat = await db.get(models.Category, cid)
-            if not cat:
-                await message.answer("Invalid category ID."); return
-            p = await repo.update_product_fields(db, pid, category_id=cid)
-
-        elif field == "description":
-            desc = None if value_raw == "-" else value_raw
-            p = await repo.update_product_fields(db, pid, description=desc)
-
-        else:
-            await message.answer("Unknown field."); return
-
-        cat = await db.get(models.Category, p.category_id)
+    if field == "name":
+        if len(value_raw) < 2:
+            await message.answer("Name too short."); return
+        p = await repo.update_product_fields(db, pid, name=value_raw)
+
+    elif field == "price":
+        try:
+            price = float(value_raw.replace(",", "."))
+        except ValueError:
+            await message.answer("Invalid price. Try again."); return
+        p = await repo.update_product_fields(db, pid, price=price)
+
+    elif field == "category":
+        if not value_raw.isdigit():
+            await message.answer("Category ID must be numeric."); return
+        cid = int(value_raw)
+        cat = await db.get(models.Category, cid)
+        if not cat:
+            await message.answer("Invalid category ID."); return
+        p = await repo.update_product_fields(db, pid, category_id=cid)
+
+    elif field == "description":
+        desc = None if value_raw == "-" else value_raw
+        p = await repo.update_product_fields(db, pid, description=desc)
+
+    else:
+        await message.answer("Unknown field."); return
+
+    cat = await db.get(models.Category, p.category_id)
 
     await state.clear()
     text = f"Updated:\n#{p.id} {p.name}\nPrice: ${float(p.price):.2f}\nCategory: {cat.name}\n\n{p.description or '—'}"
@@ -143,23 +168,21 @@ async def adm_edit_field_save(message: types.Message, state: FSMContext):
 
 # ---------- delete product (FK-safe) ----------
 @router.callback_query(F.data.startswith("adm:del:"))
-async def adm_product_delete(cb: types.CallbackQuery):
+async def adm_product_delete(cb: types.CallbackQuery, db: AsyncSession):
     if not _is_admin(cb.from_user.id):
         await cb.answer(); return
     pid = int(cb.data.split(":")[2])
 
-    async with SessionLocal() as db:
-        try:
-            await repo.delete_product(db, pid)  # hard delete
-            info = "Deleted."
-        except IntegrityError as e:
-            log.warning("Hard delete failed due to FK, marking inactive. pid=%s err=%s", pid, e)
-            # soft delete instead
-            await repo.update_product_fields(db, pid, is_active=False)
-            info = "Product is linked to orders. Marked as inactive instead."
-        products = await repo.list_products(db)
-
-    await cb.message.edit_text(f"{info}\nProducts:", reply_markup=products_kb(products))
+    try:
+        await repo.delete_product(db, pid)  # hard delete
+        info = "Deleted."
+    except IntegrityError as e:
+        log.warning("Hard delete failed due to FK, marking inactive. pid=%s err=%s", pid, e)
+        # soft delete instead
+        await repo.update_product_fields(db, pid, is_active=False)
+        info = "Product is linked to orders. Marked as inactive instead."
+
+    await cb.message.edit_text(f"{info}\nProducts:", reply_markup=await _products_page_kb(db))
     await cb.answer("Done")
 
 # ---------- add product (FSM) ----------
@@ -180,32 +203,29 @@ async def adm_add_price(message: types.Message, state: FSMContext):
     await state.set_state(NewProduct.price)
 
 @router.message(NewProduct.price)
-async def adm_add_category(message: types.Message, state: FSMContext):
+async def adm_add_category(message: types.Message, state: FSMContext, db: AsyncSession):
     try:
         price = float(message.text.replace(",", "."))
     except ValueError:
         await message.answer("Invalid price. Try again (e.g. 99.90)."); return
     await state.update_data(price=price)
 
-    async with SessionLocal() as db:
-        cats = await repo.list_categories(db)
+    cats = await repo.list_categories(db)
     if not cats:
-        async with SessionLocal() as db:
-            await repo.create_category(db, "General")
-            cats = await repo.list_categories(db)
+        await repo.create_category(db, "General")
+        cats = await repo.list_categories(db)
 
     text = "Category ID?\n" + "\n".join([f"{c.id} – {c.name}" for c in cats])
     await message.answer(text)
     await state.set_state(NewProduct.category)
 
 @router.message(NewProduct.category)
-async def adm_add_desc(message: types.Message, state: FSMContext):
+async def adm_add_desc(message: types.Message, state: FSMContext, db: AsyncSession):
     if not message.text.isdigit():
         await message.answer("Send a numeric category ID from the list above.")
         return
     cid = int(message.text)
-    async with SessionLocal() as db:
-        cat = await db.get(models.Category, cid)
+    cat = await db.get(models.Category, cid)
     if not cat:
         await message.answer("Invalid category ID. Please send an ID from the list shown.")
         return
@@ -238,23 +258,21 @@ async def adm_add_confirm(message: types.Message, state: FSMContext):
     await state.set_state(NewProduct.confirm)
 
 @router.message(NewProduct.confirm)
-async def adm_add_save(message: types.Message, state: FSMContext):
+async def adm_add_save(message: types.Message, state: FSMContext, db: AsyncSession):
     if message.text.strip().lower() != "yes":
         await state.clear()
         await message.answer("Cancelled."); return
     data = await state.get_data()
-    async with SessionLocal() as db:
-        p = await repo.create_product(
-            db,
-            category_id=data["category_id"],
-            name=data["name"],
-            price=float(data["price"]),
-            description=data["description"],
-            image_url=data["image_url"]
-        )
-        products = await repo.list_products(db)
+    p = await repo.create_product(
+        db,
+        category_id=data["category_id"],
+        name=data["name"],
+        price=float(data["price"]),
+        description=data["description"],
+        image_url=data["image_url"]
+    )
     await state.clear()
-    await message.answer(f"Saved: #{p.id} {p.name}\nProducts:", reply_markup=products_kb(products))
+    await message.answer(f"Saved: #{p.id} {p.name}\nProducts:", reply_markup=await _products_page_kb(db))
 
 # ---------- set photo via file_id ----------
 @router.callback_query(F.data.startswith("adm:setphoto:"))
@@ -269,35 +287,46 @@ async def adm_ask_photo(cb: types.CallbackQuery, state: FSMContext):
     await cb.answer()
 
 @router.message(SetPhoto.waiting_photo, F.photo)
-async def adm_save_photo(message: types.Message, state: FSMContext):
+async def adm_save_photo(message: types.Message, state: FSMContext, db: AsyncSession):
     data = await state.get_data()
     pid = data.get("product_id")
     file_id = message.photo[-1].file_id  # highest quality
-    async with SessionLocal() as db:
-        p = await repo.set_product_photo_file_id(db, pid, file_id)
-        products = await repo.list_products(db)
+    p = await repo.set_product_photo_file_id(db, pid, file_id)
     await state.clear()
-    await message.answer(f"Photo saved for #{p.id} {p.name}\nProducts:", reply_markup=products_kb(products))
+    await message.answer(f"Photo saved for #{p.id} {p.name}\nProducts:", reply_markup=await _products_page_kb(db))
 
 # ---------- orders ----------
+async def _orders_page_kb(db: AsyncSession, status: str, cursor_id: int | None = None, backwards: bool = False):
+    orders, _ = await repo.list_orders_page(db, status, cursor_id, backwards, limit=ADMIN_PAGE_SIZE)
+    total = await repo.count_orders(db, status)
+    offset = await repo.count_orders(db, status, orders[0].id) if orders else 0
+    return orders_list_kb(orders, status, **_page_nav(offset, len(orders), total))
+
 @router.callback_query(F.data.startswith("adm:orders"))
-async def adm_orders(cb: types.CallbackQuery):
+async def adm_orders(cb: types.CallbackQuery, db: AsyncSession):
     if not _is_admin(cb.from_user.id):
         await cb.answer(); return
     parts = cb.data.split(":")
     current = parts[2] if len(parts) > 2 else "all"
-    async with SessionLocal() as db:
-        orders = await repo.list_orders_by_status(db, current, limit=30)
-    await cb.message.edit_text(f"Orders (filter: {current})", reply_markup=orders_list_kb(orders, current))
+    await cb.message.edit_text(f"Orders (filter: {current})", reply_markup=await _orders_page_kb(db, current))
+    await cb.answer()
+
+@router.callback_query(F.data.startswith("adm:ordp:"))
+async def adm_orders_page(cb: types.CallbackQuery, db: AsyncSession):
+    # adm:ordp:<status>:<p|n>:<cursor order id>
+    if not _is_admin(cb.from_user.id):
+        await cb.answer(); return
+    _, _, current, direction, cursor_id = cb.data.split(":")
+    kb = await _orders_page_kb(db, current, int(cursor_id), backwards=direction == "p")
+    await cb.message.edit_text(f"Orders (filter: {current})", reply_markup=kb)
     await cb.answer()
 
 @router.callback_query(F.data.startswith("adm:ord:"))
-async def adm_order_view(cb: types.CallbackQuery):
+async def adm_order_view(cb: types.CallbackQuery, db: AsyncSession):
     if not _is_admin(cb.from_user.id):
         await cb.answer(); return
     oid = int(cb.data.split(":")[2])
-    async with SessionLocal() as db:
-        order, items, user = await repo.get_order_with_items(db, oid)
+    order, items, user = await repo.get_order_with_items(db, oid)
     if not order:
         await cb.message.edit_text("Order not found.", reply_markup=admin_menu_kb())
         await cb.answer(); return
@@ -323,55 +352,101 @@ async def adm_order_view(cb: types.CallbackQuery):
     await cb.answer()
 
 @router.callback_query(F.data.startswith("adm:ordset:"))
-async def adm_order_set_status(cb: types.CallbackQuery):
+async def adm_order_set_status(cb: types.CallbackQuery, db: AsyncSession):
     if not _is_admin(cb.from_user.id):
         await cb.answer(); return
     _, _, oid, status = cb.data.split(":")
     oid = int(oid)
-    async with SessionLocal() as db:
-        order = await repo.set_order_status(db, oid, status)
-        if not order:
-            await cb.answer("Order not found", show_alert=True); return
-        _, _, user = await repo.get_order_with_items(db, oid)
-
-    if user:
-        try:
-            await cb.bot.send_message(user.tg_id, f"📦 Your order {order.order_number} status is now: {status}")
-        except Exception:
-            pass
+    # the customer's notification is queued with the status change, delivered by the outbox sender
+    order = await repo.set_order_status(
+        db, oid, status,
+        notify=lambda o, tg_id: [(tg_id, f"📦 Your order {o.order_number} status is now: {status}")] if tg_id else [],
+    )
+    if not order:
+        await cb.answer("Order not found", show_alert=True); return
+    outbox.notify()
 
     await cb.answer("Status updated")
-    await adm_order_view(cb)
+    await adm_order_view(cb, db)
 
 # ---------- CSV export ----------
+_EXPORT_STATUSES = ("all", "new", "paid", "shipped", "done")
+
+async def _send_export(message: types.Message, db: AsyncSession, since: datetime, until: datetime | None,
+                       status: str, compress: bool, label: str):
+    path, rows = await export_orders_csv(db, since, until, status, compress=compress)
+    try:
+        name = f"orders_{label}.csv" + (".gz" if compress else "")
+        await message.answer_document(
+            document=FSInputFile(path, filename=name),
+            caption=f"Orders export ({label}, status: {status}, {rows} lines)",
+        )
+    finally:
+        os.remove(path)
+
 @router.callback_query(F.data == "adm:csv30")
-async def adm_export_csv(cb: types.CallbackQuery):
+async def adm_export_csv(cb: types.CallbackQuery, db: AsyncSession):
     if not _is_admin(cb.from_user.id):
         await cb.answer(); return
-    async with SessionLocal() as db:
-        orders = await repo.list_orders_last_days(db, 30)
-
-    buf = io.StringIO()
-    writer = csv.writer(buf)
-    writer.writerow(["order_number", "created_at", "status", "user_tg_id", "user_name", "item_name", "qty", "price", "line_total", "order_total"])
-
-    async with SessionLocal() as db:
-        for o in orders:
-            order, items, user = await repo.get_order_with_items(db, o.id)
-            if not items:
-                writer.writerow([o.order_number, o.created_at, o.status, user.tg_id if user else "", getattr(user, "name", "") or "", "", "", "", "", float(o.total)])
+    await cb.answer("Preparing export…")
+    since = datetime.utcnow() - timedelta(days=30)
+    await _send_export(cb.message, db, since, None, "all", False, "last_30_days")
+
+@router.message(Command("export"))
+async def adm_export_cmd(message: types.Message, db: AsyncSession):
+    # /export [FROM [TO]] [status] [gz]   dates as YYYY-MM-DD, TO inclusive; default last 30 days
+    if not _is_admin(message.from_user.id):
+        return
+    dates, status, compress = [], "all", False
+    try:
+        for arg in message.text.split()[1:]:
+            if arg == "gz":
+                compress = True
+            elif arg in _EXPORT_STATUSES:
+                status = arg
             else:
-                for it in items:
-                    writer.writerow([
-                        o.order_number, o.created_at, o.status,
-                        user.tg_id if user else "", getattr(user, "name", "") or "",
-                        it["name"], it["qty"], it["price"], it["qty"] * it["price"], float(o.total)
-                    ])
-
-    csv_bytes = buf.getvalue().encode("utf-8-sig")
-    file = BufferedInputFile(csv_bytes, filename="orders_last_30_days.csv")
-    await cb.message.answer_document(document=file, caption="Orders export (last 30 days)")
-    await cb.answer()
+                dates.append(datetime.strptime(arg, "%Y-%m-%d"))
+        if len(dates) > 2:
+            raise ValueError
+    except ValueError:
+        await message.answer("Usage: /export [YYYY-MM-DD [YYYY-MM-DD]] [all|new|paid|shipped|done] [gz]")
+        return
+
+    if not dates:
+        since, until, label = datetime.utcnow() - timedelta(days=30), None, "last_30_days"
+    else:
+        since = dates[0]
+        until = dates[1] + timedelta(days=1) if len(dates) == 2 else None
+        label = f"{dates[0]:%Y-%m-%d}_{dates[1]:%Y-%m-%d}" if len(dates) == 2 else f"since_{dates[0]:%Y-%m-%d}"
+    await _send_export(message, db, since, until, status, compress, label)
+
+# ---------- search index ----------
+@router.message(Command("reindex"))
+async def adm_reindex(message: types.Message, db: AsyncSession):
+    if not _is_admin(message.from_user.id):
+        return
+    await repo.rebuild_search_index(db)
+    await message.answer("Search index rebuilt ✅")
+
+# ---------- media warm-up ----------
+_warmup_task: asyncio.Task | None = None
+
+@router.message(Command("warmup"))
+async def adm_warmup(message: types.Message, bot: Bot):
+    # pre-upload product images so customers get file_id sends from the first view
+    global _warmup_task
+    if not _is_admin(message.from_user.id):
+        return
+    if _warmup_task and not _warmup_task.done():
+        await message.answer("Warm-up already running…")
+        return
+
+    async def run():
+        stored, failed = await warm_up(bot, message.chat.id, {"hero": HERO_URL})
+        await message.answer(f"Warm-up done ✅ stored: {stored}, failed: {failed}")
+
+    _warmup_task = asyncio.create_task(run())
+    await message.answer("Warm-up started; images are sent here and deleted as they upload.")
 
 # ---------- back to admin home ----------
 @router.callback_query(F.data.in_(("adm:back", "adm:home")))
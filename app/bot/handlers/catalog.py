@@ -1,139 +1,170 @@
 from aiogram import Router, F, types
-from aiogram.filters import Command
-from app.db.base import SessionLocal
-from app.db import repo, models
+from aiogram.filters import Command, CommandObject
+from app.db.cache import catalog
 from app.bot.keyboards.catalog import categories_kb, products_kb, product_actions_kb
+from app.bot.render import render_cache
+from app.bot.media import media
+from app.bot import nav
 
 router = Router()
 
 # nice hero image for the shop "home"
 HERO_URL = "https://images.unsplash.com/photo-1520975582071-a28fdf2b1a1a"
 
+# button presses edit the pressed message into the next screen (see app/bot/nav.py);
+# commands reply with a new message (edit=False)
+
+def _product_caption(p, version: int) -> str:
+    # memoized per product + catalog version
+    return render_cache.get(
+        version, ("caption", p.id),
+        lambda: f"*{p.name}*\n\n{p.description or '—'}\n\nPrice: ${float(p.price):.2f}",
+    )
+
+async def _show_hero(message: types.Message, caption: str, reply_markup=None, edit: bool = True):
+    # hero banner by file_id once Telegram has seen it; text if the photo fails
+    photo = await media.photo("hero", HERO_URL)
+    try:
+        sent = await nav.show_photo(message, photo, caption, reply_markup, edit=edit)
+    except Exception:
+        if photo != HERO_URL:
+            media.forget("hero")
+        return await nav.show_text(message, caption, reply_markup, edit=edit)
+    if photo == HERO_URL:
+        await media.remember("hero", HERO_URL, sent)
+    return sent
+
+async def _show_list(message: types.Message, text: str, reply_markup):
+    # list screens are text; on a photo message they become the caption over the hero
+    # banner, since a photo message can't be edited into plain text
+    if getattr(message, "photo", None):
+        return await _show_hero(message, text, reply_markup)
+    return await nav.show_text(message, text, reply_markup)
+
+async def _show_product_card(message: types.Message, p, version: int, edit: bool = True):
+    # prefer file_id, then URL (or hero); else text only; never leave chat blank
+    caption = _product_caption(p, version)
+    kb = product_actions_kb(p.id, p.category_id, version)
+    if p.image_file_id:
+        try:
+            await nav.show_photo(message, p.image_file_id, caption, kb, "Markdown", edit=edit)
+            return
+        except Exception:
+            pass
+    if p.image_url:
+        try:
+            sent = await nav.show_photo(message, p.image_url, caption, kb, "Markdown", edit=edit)
+        except Exception:
+            pass
+        else:
+            # next time this product goes out by file_id
+            await media.remember_product(p.id, sent)
+            return
+    try:
+        await nav.show_photo(message, await media.photo("hero", HERO_URL), caption, kb, "Markdown", edit=edit)
+    except Exception:
+        await nav.show_text(message, caption, kb, "Markdown", edit=edit)
+
 # ✅ NEW: make /start show the same view as /shop
+# deep links from inline results arrive as /start prod_<id> and open that product card
 @router.message(Command("start"))
-async def cmd_start(message: types.Message):
+async def cmd_start(message: types.Message, command: CommandObject):
+    args = command.args or ""
+    if args.startswith("prod_") and args[5:].isdigit():
+        version = catalog.version
+        p = await catalog.product(int(args[5:]))
+        if p and p.is_active:
+            await _show_product_card(message, p, version, edit=False)
+            return
     await cmd_shop(message)
 
 @router.message(Command("shop"))
 async def cmd_shop(message: types.Message):
     # list categories with a hero banner
-    async with SessionLocal() as db:
-        cats = await repo.list_categories(db)
+    version = catalog.version
+    cats = await catalog.categories()
     if not cats:
         await message.answer("No categories yet.")
         return
-
-    try:
-        # send a fresh photo with caption + keyboard
-        await message.answer_photo(
-            photo=HERO_URL,
-            caption="Choose a category:",
-            reply_markup=categories_kb(cats)
-        )
-    except Exception:
-        # fallback to text if photo fails
-        await message.answer("Choose a category:", reply_markup=categories_kb(cats))
+    kb = categories_kb(cats, version)
+    # fresh photo with caption + keyboard (text if the photo fails)
+    await _show_hero(message, "Choose a category:", kb, edit=False)
 
 @router.callback_query(F.data.startswith("cat:"))
 async def on_category(cb: types.CallbackQuery):
-    # show products of a category
+    # show the first page of products of a category
     category_id = int(cb.data.split(":")[1])
-    async with SessionLocal() as db:
-        products = await repo.list_products_by_category(db, category_id)
-        cat = await db.get(models.Category, category_id)
-
-    if not products:
-        # reply as a new message and remove old one to keep chat clean
-        await cb.message.answer(
-            f"Category: {cat.name}\nNo products yet.",
-            reply_markup=categories_kb([cat])
-        )
-        try:
-            await cb.message.delete()
-        except Exception:
-            pass
-        await cb.answer()
+    version = catalog.version
+    cat = await catalog.category(category_id)
+    if not cat:
+        await cb.answer("Category not found", show_alert=True)
+        return
+    page = await catalog.products_page(category_id)
+
+    if not page.items:
+        await _show_list(cb.message, f"Category: {cat.name}\nNo products yet.", categories_kb([cat]))
+    else:
+        await _show_list(cb.message, f"Category: {cat.name}\nPick a product:",
+                         products_kb(page, category_id, (None, False), version))
+    await cb.answer()
+
+@router.callback_query(F.data.startswith("catp:"))
+async def on_category_page(cb: types.CallbackQuery):
+    # prev/next page: catp:<category_id>:<p|n>:<cursor product id>
+    _, category_id, direction, cursor_id = cb.data.split(":")
+    category_id, cursor_id = int(category_id), int(cursor_id)
+    backwards = direction == "p"
+    version = catalog.version
+    cat = await catalog.category(category_id)
+    if not cat:
+        await cb.answer("Category not found", show_alert=True)
         return
+    page = await catalog.products_page(category_id, cursor_id, backwards)
+    if not page.items:
+        # cursor product vanished or range emptied; restart from the first page
+        backwards, cursor_id = False, None
+        page = await catalog.products_page(category_id)
 
-    await cb.message.answer(
-        f"Category: {cat.name}\nPick a product:",
-        reply_markup=products_kb(products, category_id)
+    await _show_list(
+        cb.message, f"Category: {cat.name}\nPick a product:",
+        products_kb(page, category_id, (cursor_id, backwards), version)
     )
-    try:
-        await cb.message.delete()
-    except Exception:
-        pass
     await cb.answer()
 
 @router.callback_query(F.data.startswith("prod:"))
 async def on_product(cb: types.CallbackQuery):
-    # product detail; prefer file_id, then URL; else placeholder; never leave chat blank
+    # product detail in place of the list it was picked from
     product_id = int(cb.data.split(":")[1])
-    async with SessionLocal() as db:
-        p = await db.get(models.Product, product_id)
-
-    caption = f"*{p.name}*\n\n{p.description or '—'}\n\nPrice: ${float(p.price):.2f}"
-    kb = product_actions_kb(p.id, p.category_id)
-
-    # try file_id
-    if p.image_file_id:
-        try:
-            await cb.message.answer_photo(photo=p.image_file_id, caption=caption, reply_markup=kb, parse_mode="Markdown")
-            try: await cb.message.delete()
-            except Exception: pass
-            await cb.answer()
-            return
-        except Exception:
-            pass
-
-    # try URL (or fallback to HERO_URL)
-    url = p.image_url or HERO_URL
-    try:
-        await cb.message.answer_photo(photo=url, caption=caption, reply_markup=kb, parse_mode="Markdown")
-        try: await cb.message.delete()
-        except Exception: pass
-        await cb.answer()
+    version = catalog.version
+    p = await catalog.product(product_id)
+    if not p:
+        await cb.answer("Product not found", show_alert=True)
         return
-    except Exception:
-        # ultimate fallback: text only
-        try:
-            await cb.message.edit_text(caption, reply_markup=kb, parse_mode="Markdown")
-        except Exception:
-            await cb.message.answer(caption, reply_markup=kb, parse_mode="Markdown")
-            try: await cb.message.delete()
-            except Exception: pass
-        await cb.answer()
+
+    await _show_product_card(cb.message, p, version)
+    await cb.answer()
 
 @router.callback_query(F.data == "back:catlist")
 async def back_to_categories(cb: types.CallbackQuery):
-    # return to categories and remove photo messages to keep chat clean
-    async with SessionLocal() as db:
-        cats = await repo.list_categories(db)
-    # always send a fresh text/photo message, then delete the old one (photo or text)
-    try:
-        await cb.message.answer_photo(HERO_URL, caption="Choose a category:", reply_markup=categories_kb(cats))
-    except Exception:
-        await cb.message.answer("Choose a category:", reply_markup=categories_kb(cats))
-    try:
-        await cb.message.delete()
-    except Exception:
-        pass
+    # return to categories on the hero banner
+    version = catalog.version
+    cats = await catalog.categories()
+    await _show_hero(cb.message, "Choose a category:", categories_kb(cats, version))
     await cb.answer()
 
 @router.callback_query(F.data.startswith("back:cat:"))
 async def back_to_products(cb: types.CallbackQuery):
-    # return to product list and remove current message (photo/text)
+    # return to the product list (first page)
     category_id = int(cb.data.split(":")[2])
-    async with SessionLocal() as db:
-        products = await repo.list_products_by_category(db, category_id)
-        cat = await db.get(models.Category, category_id)
+    version = catalog.version
+    cat = await catalog.category(category_id)
+    if not cat:
+        await cb.answer("Category not found", show_alert=True)
+        return
+    page = await catalog.products_page(category_id)
 
-    await cb.message.answer(
-        f"Category: {cat.name}\nPick a product:",
-        reply_markup=products_kb(products, category_id)
+    await _show_list(
+        cb.message, f"Category: {cat.name}\nPick a product:",
+        products_kb(page, category_id, (None, False), version)
     )
-    try:
-        await cb.message.delete()
-    except Exception:
-        pass
-    await cb.answer()
\ No newline at end of file
+    await cb.answer()
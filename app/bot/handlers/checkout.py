@@ -4,9 +4,10 @@ from aiogram import Router, F, types
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.bot.states.checkout import CheckoutStates
-from app.db.base import SessionLocal
 from app.db import repo
+from app.bot.outbox import outbox
 from app.core.config import ADMIN_IDS
 
 router = Router()
@@ -84,7 +85,7 @@ async def confirm(message: types.Message, state: FSMContext):
     await state.set_state(CheckoutStates.confirm)
 
 @router.callback_query(CheckoutStates.confirm, F.data.in_(("co:ok", "co:cancel")))
-async def finalize(cb: types.CallbackQuery, state: FSMContext):
+async def finalize(cb: types.CallbackQuery, state: FSMContext, db: AsyncSession, user_id: int):
     data = await state.get_data()
     if cb.data == "co:cancel":
         await state.clear()
@@ -92,30 +93,28 @@ async def finalize(cb: types.CallbackQuery, state: FSMContext):
         await cb.answer()
         return
 
+    # notify admins — use robust mention; queued with the order, delivered by the outbox sender
+    ship = data.get("shipping", "—")
+    user_mention = _build_user_mention(cb.from_user)
+
+    def admin_alerts(order):
+        alert = (
+            f"🆕 New order {order.order_number}\n"
+            f"User: {user_mention}\n"
+            f"Shipping: {ship}\n"
+            f"Total: ${float(order.total):.2f}\nStatus: {order.status}"
+        )
+        return [(admin_id, alert) for admin_id in ADMIN_IDS]
+
     # persist user details + create order
-    async with SessionLocal() as db:
-        user = await repo.update_user_details(db, cb.from_user.id, data["name"], data["phone"], data["address"])
-        order = await repo.create_order(db, user.id)
+    await repo.update_user_details_by_id(db, user_id, data["name"], data["phone"], data["address"])
+    order = await repo.create_order(db, user_id, notify=admin_alerts)
+    if ADMIN_IDS:
+        outbox.notify()
 
     await state.clear()
     await cb.message.edit_text(
         f"✅ Order placed!\nOrder № {order.order_number}\nTotal: ${float(order.total):.2f}"
     )
 
-    # notify admins — use robust mention
-    ship = data.get("shipping", "—")
-    user_mention = _build_user_mention(cb.from_user)
-    if ADMIN_IDS:
-        for admin_id in ADMIN_IDS:
-            try:
-                await cb.bot.send_message(
-                    admin_id,
-                    f"🆕 New order {order.order_number}\n"
-                    f"User: {user_mention}\n"
-                    f"Shipping: {ship}\n"
-                    f"Total: ${float(order.total):.2f}\nStatus: {order.status}"
-                )
-            except Exception:
-                pass
-
-    await cb.answer()
\ No newline at end of file
+    await cb.answer()
@@ -0,0 +1,51 @@
+from html import escape
+from aiogram import Router, Bot, types
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from app.core.config import INLINE_RESULTS, INLINE_CACHE_TIME
+from app.db.product_index import product_index
+
+router = Router()
+
+# @ourbot <query> from any chat; answered from the in-memory name index, no DB per keystroke
+
+def _open_kb(bot_username: str, product_id: int):
+    # deep link back into the bot: /start prod_<id> opens the product card
+    kb = InlineKeyboardBuilder()
+    kb.button(text="🛍 Open in shop", url=f"https://t.me/{bot_username}?start=prod_{product_id}")
+    return kb.as_markup()
+
+def _result(p, bot_username: str) -> types.InlineQueryResult:
+    price = f"${p.price:.2f}"
+    caption = f"<b>{escape(p.name)}</b>\n\nPrice: {price}"
+    kb = _open_kb(bot_username, p.id)
+    rid = f"p{p.id}"
+    if p.image_file_id:
+        return types.InlineQueryResultCachedPhoto(
+            id=rid, photo_file_id=p.image_file_id, title=p.name, description=price,
+            caption=caption, parse_mode="HTML", reply_markup=kb,
+        )
+    if p.image_url:
+        return types.InlineQueryResultPhoto(
+            id=rid, photo_url=p.image_url, thumbnail_url=p.image_url, title=p.name, description=price,
+            caption=caption, parse_mode="HTML", reply_markup=kb,
+        )
+    return types.InlineQueryResultArticle(
+        id=rid, title=p.name, description=f"{price} · {p.description or ''}".rstrip(" ·"),
+        input_message_content=types.InputTextMessageContent(message_text=caption, parse_mode="HTML"),
+        reply_markup=kb,
+    )
+
+@router.inline_query()
+async def on_inline_query(q: types.InlineQuery, bot: Bot):
+    # offset is our own page position; "" tells Telegram there is nothing more to load
+    offset = int(q.offset) if q.offset.isdigit() else 0
+    limit = min(INLINE_RESULTS, 50)
+    await product_index.ensure_built()
+    found, has_more = product_index.search(q.query, limit, offset)
+    me = await bot.me()
+    await q.answer(
+        [_result(p, me.username) for p in found],
+        cache_time=INLINE_CACHE_TIME,
+        is_personal=False,
+        next_offset=str(offset + len(found)) if has_more else "",
+    )
@@ -0,0 +1,61 @@
+from html import escape
+from aiogram import Router, F, types
+from aiogram.filters import Command, CommandObject
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+from aiogram.types import InlineKeyboardButton
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import SEARCH_PAGE_SIZE
+from app.db import repo
+
+router = Router()
+
+# the query rides in the page buttons ("srch:<page>:<query>"), so paging works after
+# FSM resets and restarts; callback_data is capped at 64 bytes, so longer queries
+# keep only the words that fit (the header shows what was actually searched)
+_PAGE_PREFIX_BYTES = len("srch:999:")
+
+def _fit_query(raw: str) -> str:
+    words = raw.split()
+    while words and len(" ".join(words).encode()) > 64 - _PAGE_PREFIX_BYTES:
+        words.pop()
+    # a single overlong word: cut it at a character boundary
+    return " ".join(words) or raw.encode()[:64 - _PAGE_PREFIX_BYTES].decode(errors="ignore")
+
+def _results_view(query: str, rows, page: int, has_more: bool):
+    if not rows:
+        return f"🔎 Nothing found for “{escape(query)}”.", None
+    lines = [f"🔎 Results for “{escape(query)}” (page {page + 1}):"]
+    kb = InlineKeyboardBuilder()
+    for r in rows:
+        lines.append(f"• {escape(r.name)} — ${float(r.price):.2f}")
+        kb.row(InlineKeyboardButton(text=r.name, callback_data=f"prod:{r.id}"))
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton(text="◀️ Prev", callback_data=f"srch:{page - 1}:{query}"))
+    if has_more:
+        nav.append(InlineKeyboardButton(text="Next ▶️", callback_data=f"srch:{page + 1}:{query}"))
+    if nav:
+        kb.row(*nav)
+    return "\n".join(lines), kb.as_markup()
+
+@router.message(Command("search"))
+async def cmd_search(message: types.Message, command: CommandObject, db: AsyncSession):
+    query = _fit_query((command.args or "").strip())
+    if not query:
+        await message.answer("Usage: /search <text>, e.g. /search leather wallet")
+        return
+    rows, has_more = await repo.search_products(db, query, limit=SEARCH_PAGE_SIZE)
+    text, kb = _results_view(query, rows, 0, has_more)
+    await message.answer(text, reply_markup=kb)
+
+@router.callback_query(F.data.startswith("srch:"))
+async def on_search_page(cb: types.CallbackQuery, db: AsyncSession):
+    _, page, query = (cb.data.split(":", 2) + [""])[:3]
+    page = int(page)
+    if not query:  # buttons sent before the query moved into callback_data
+        await cb.answer("Search expired, send /search again.", show_alert=True)
+        return
+    rows, has_more = await repo.search_products(db, query, limit=SEARCH_PAGE_SIZE, offset=page * SEARCH_PAGE_SIZE)
+    text, kb = _results_view(query, rows, page, has_more)
+    await cb.message.edit_text(text, reply_markup=kb)
+    await cb.answer()
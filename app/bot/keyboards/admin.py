@@ -11,12 +11,25 @@ def admin_menu_kb():
     kb.adjust(1)
     return kb.as_markup()
 
-def products_kb(products):
+def _pager_row(kb: InlineKeyboardBuilder, prefix: str, items, page: int, pages: int, has_prev: bool, has_next: bool):
+    # ◀️ page/pages ▶️ ; cursors are the first/last ids on this page
+    if pages <= 1 or not items:
+        return
+    btns = []
+    if has_prev:
+        btns.append(InlineKeyboardButton(text="◀️", callback_data=f"{prefix}:p:{items[0].id}"))
+    btns.append(InlineKeyboardButton(text=f"{page}/{pages}", callback_data="noop"))
+    if has_next:
+        btns.append(InlineKeyboardButton(text="▶️", callback_data=f"{prefix}:n:{items[-1].id}"))
+    kb.row(*btns)
+
+def products_kb(products, page: int = 1, pages: int = 1, has_prev: bool = False, has_next: bool = False):
     kb = InlineKeyboardBuilder()
     for p in products:
         has_img = bool(getattr(p, "image_file_id", None) or getattr(p, "image_url", None))
         cam = "📷" if has_img else "🚫"
         kb.row(InlineKeyboardButton(text=f"#{p.id} {p.name} {cam}", callback_data=f"adm:prod:{p.id}"))
+    _pager_row(kb, "adm:prodp", products, page, pages, has_prev, has_next)
     kb.row(InlineKeyboardButton(text="⬅️ Back", callback_data="adm:back"))
     return kb.as_markup()
 
@@ -43,7 +56,8 @@ def product_edit_menu_kb(pid: int):
     kb.row(InlineKeyboardButton(text="⬅️ Back", callback_data=f"adm:prod:{pid}"))
     return kb.as_markup()
 
-def orders_list_kb(orders, current_filter: str):
+def orders_list_kb(orders, current_filter: str, page: int = 1, pages: int = 1,
+                   has_prev: bool = False, has_next: bool = False):
     # first: filters row
     kb = InlineKeyboardBuilder()
     filters = [("all", "All"), ("new", "New"), ("paid", "Paid"), ("shipped", "Shipped"), ("done", "Done")]
@@ -57,6 +71,7 @@ def orders_list_kb(orders, current_filter: str):
     if orders:
         for o in orders:
             kb.row(InlineKeyboardButton(text=f"{o.order_number} ({o.status})", callback_data=f"adm:ord:{o.id}"))
+    _pager_row(kb, f"adm:ordp:{current_filter}", orders, page, pages, has_prev, has_next)
     kb.row(InlineKeyboardButton(text="⬅️ Back", callback_data="adm:back"))
     return kb.as_markup()
 
@@ -1,5 +1,7 @@
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from app.db import models
+from aiogram.types import InlineKeyboardButton
+from app.db.cache import CachedCategory, CachedPage
+from app.bot.render import render_cache
 
 # small emoji map for nicer look
 EMOJI = {
@@ -11,8 +13,13 @@ EMOJI = {
     "Watches": "⌚",
 }
 
-def categories_kb(categories: list[models.Category]):
-    """Inline keyboard for categories (3 per row) with emojis."""
+def categories_kb(categories: list[CachedCategory], version: int | None = None):
+    """Inline keyboard for categories (3 per row) with emojis.
+
+    Pass the catalog version when `categories` is the full list to reuse the markup.
+    """
+    if version is not None:
+        return render_cache.get(version, ("cats",), lambda: categories_kb(categories))
     kb = InlineKeyboardBuilder()
     for c in categories:
         title = f"{EMOJI.get(c.name, '•')} {c.name}"
@@ -20,18 +27,35 @@ def categories_kb(categories: list[models.Category]):
     kb.adjust(3)  # 3 buttons per row
     return kb.as_markup()
 
-def products_kb(products: list[models.Product], category_id: int):
-    """Products of a category + back buttons."""
+def products_kb(page: CachedPage, category_id: int, cursor: tuple[int | None, bool] = (None, False),
+                version: int | None = None):
+    """One page of a category + prev/next + back buttons.
+
+    `cursor` is the (cursor_id, backwards) pair the page was fetched with; only used as the cache key.
+    """
+    if version is not None:
+        return render_cache.get(version, ("prods", category_id, cursor), lambda: products_kb(page, category_id))
     kb = InlineKeyboardBuilder()
-    for p in products:
-        kb.button(text=p.name, callback_data=f"prod:{p.id}")
-    # navigation
-    kb.button(text="⬅️ Back to categories", callback_data="back:catlist")
+    for pid, name in page.items:
+        kb.button(text=name, callback_data=f"prod:{pid}")
     kb.adjust(2)  # 2 per row for readability
+    # paging: cursor is the first/last product id of this page (keyset on name, id)
+    nav = []
+    if page.has_prev and page.items:
+        nav.append(InlineKeyboardButton(text="◀️ Prev", callback_data=f"catp:{category_id}:p:{page.items[0][0]}"))
+    if page.has_next and page.items:
+        nav.append(InlineKeyboardButton(text="Next ▶️", callback_data=f"catp:{category_id}:n:{page.items[-1][0]}"))
+    if nav:
+        kb.row(*nav)
+    # navigation
+    kb.row(InlineKeyboardButton(text="⬅️ Back to categories", callback_data="back:catlist"))
     return kb.as_markup()
 
-def product_actions_kb(product_id: int, category_id: int):
+def product_actions_kb(product_id: int, category_id: int, version: int | None = None):
     """Actions under a product card."""
+    if version is not None:
+        return render_cache.get(version, ("actions", product_id, category_id),
+                                lambda: product_actions_kb(product_id, category_id))
     kb = InlineKeyboardBuilder()
     kb.button(text="➕ Add to cart", callback_data=f"add:{product_id}")
     kb.button(text="✅ Checkout", callback_data="checkout")
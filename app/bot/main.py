@@ -4,8 +4,18 @@ from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 
-from app.core.config import BOT_TOKEN
-from app.bot.handlers import catalog, cart, checkout, admin
+from app.core.config import BOT_TOKEN, BOT_MODE, BOT_WORKERS, METRICS_PORT
+from app.bot.handlers import catalog, cart, checkout, admin, search, inline
+from app.bot.middlewares.db import DbSessionMiddleware, ReleaseDbMiddleware
+from app.bot.middlewares.throttle import ThrottlingMiddleware
+from app.bot.middlewares.metrics import UpdateMetricsMiddleware, HandlerMetricsMiddleware, ApiMetricsMiddleware
+from app.bot.middlewares.querybudget import QueryBudgetMiddleware, QueryScopeHandlerMiddleware
+from app.bot.metrics_server import MetricsServer
+from app.bot.webhook import run_webhook
+from app.bot.sharding import run_supervisor
+from app.bot.outbox import outbox
+from app.bot.storage import SqliteStorage
+from app.db.base import init_db
 
 # logging setup
 logging.basicConfig(
@@ -14,20 +24,70 @@ logging.basicConfig(
 )
 logger = logging.getLogger("ecombot")
 
-async def main():
-    logger.info("Starting bot…")
-
+def make_bot() -> Bot:
     # ✅ aiogram 3.7+ way to set default parse_mode
     bot = Bot(
         token=BOT_TOKEN,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
+    bot.session.middleware(ApiMetricsMiddleware())  # Bot API latency by method
+    bot.session.middleware(ReleaseDbMiddleware())   # no pooled connection held across API calls
+    return bot
 
-    dp = Dispatcher()
+def build_dispatcher(background: bool = True, metrics_port: int = METRICS_PORT) -> Dispatcher:
+    # background=False skips the outbox sender and FSM cleanup (all but one shard worker)
+    # metrics_port=0 runs without the /metrics endpoint
+    # FSM flows (checkout, admin edits) persist in the DB and expire after FSM_TTL
+    storage = SqliteStorage()
+    # FSM middleware is registered below, after the throttle
+    dp = Dispatcher(storage=storage, disable_fsm=True)
+    # metrics: update counts/in-flight for everything, latency/errors per matched handler
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    handler_metrics, handler_scope = HandlerMetricsMiddleware(), QueryScopeHandlerMiddleware()
+    for observer in (dp.message, dp.callback_query, dp.inline_query):
+        observer.middleware(handler_metrics)
+        observer.middleware(handler_scope)
+    # per-user rate limits first, so throttled updates never touch FSM storage or the DB
+    dp["throttle"] = throttle = ThrottlingMiddleware(fsm=dp.fsm)
+    dp.update.outer_middleware(throttle)
+    # per-update SQL statement budget / N+1 check (QUERY_BUDGET_MODE); before the FSM
+    # middleware, so state reads on a storage cache miss count too
+    dp.update.outer_middleware(QueryBudgetMiddleware())
+    dp.update.outer_middleware(dp.fsm)
+    # one DB session + resolved user id per update
+    dp.update.outer_middleware(DbSessionMiddleware())
     dp.include_router(catalog.router)
+    dp.include_router(search.router)
+    dp.include_router(inline.router)
     dp.include_router(cart.router)
     dp.include_router(checkout.router)
     dp.include_router(admin.router)
+    if background:
+        # background delivery of queued notifications, expiry of abandoned flows
+        dp.startup.register(outbox.start)
+        dp.shutdown.register(outbox.stop)
+        dp.startup.register(storage.start)
+    dp.shutdown.register(storage.close)
+    if metrics_port:
+        metrics = MetricsServer(port=metrics_port)
+        dp.startup.register(metrics.start)
+        dp.shutdown.register(metrics.stop)
+    return dp
+
+async def main():
+    logger.info("Starting bot…")
+    await init_db()  # creates missing tables (e.g. outbox) on existing databases
+
+    if BOT_WORKERS > 1:
+        await run_supervisor(BOT_WORKERS)
+        return
+
+    bot = make_bot()
+    dp = build_dispatcher()
+
+    if BOT_MODE == "webhook":
+        await run_webhook(bot, dp)
+        return
 
     await bot.delete_webhook(drop_pending_updates=True)
     logger.info("Bot polling started")
@@ -37,4 +97,4 @@ if __name__ == "__main__":
     try:
         asyncio.run(main())
     except (KeyboardInterrupt, SystemExit):
-        logger.info("Bot stopped")
\ No newline at end of file
+        logger.info("Bot stopped")
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from aiogram import Bot, types
+from aiogram.exceptions import TelegramRetryAfter
+from app.core.config import OUTBOX_CHAT_RATE
+from app.bot.ratelimit import TokenBucket
+from app.db.base import SessionLocal
+from app.db import repo
+
+log = logging.getLogger("ecombot.media")
+
+# The first time a URL image is sent, Telegram downloads it and the returned
+# message carries a file_id. We keep that file_id (products.image_file_id for
+# product pictures, media_assets for static images like the banner) so later
+# sends skip the download.
+
+def photo_file_id(sent: types.Message | None) -> str | None:
+    # largest size of a sent photo
+    photo = getattr(sent, "photo", None)
+    return photo[-1].file_id if photo else None
+
+class MediaStore:
+    def __init__(self):
+        self._assets: dict[str, tuple[str, str]] | None = None  # key -> (source url, file_id)
+
+    async def _load(self) -> dict[str, tuple[str, str]]:
+        if self._assets is None:
+            async with SessionLocal() as db:
+                self._assets = await repo.get_media_assets(db)
+        return self._assets
+
+    async def photo(self, key: str, url: str) -> str:
+        # file_id if we have one for this exact URL, else the URL itself
+        hit = (await self._load()).get(key)
+        return hit[1] if hit and hit[0] == url else url
+
+    def forget(self, key: str):
+        # Telegram rejected the stored file_id; fall back to the URL next time
+        if self._assets:
+            self._assets.pop(key, None)
+
+    async def remember(self, key: str, url: str, sent: types.Message | None):
+        file_id = photo_file_id(sent)
+        if not file_id:
+            return
+        assets = await self._load()
+        if assets.get(key) == (url, file_id):
+            return
+        assets[key] = (url, file_id)
+        try:
+            async with SessionLocal() as db:
+                await repo.set_media_asset(db, key, url, file_id)
+        except Exception:
+            log.exception("Failed to store file_id for %s", key)
+
+    async def remember_product(self, product_id: int, sent: types.Message | None):
+        file_id = photo_file_id(sent)
+        if not file_id:
+            return
+        try:
+            async with SessionLocal() as db:
+                await repo.store_product_file_id(db, product_id, file_id)
+        except Exception:
+            log.exception("Failed to store file_id for product %s", product_id)
+
+media = MediaStore()
+
+async def warm_up(bot: Bot, chat_id: int, assets: dict[str, str] | None = None) -> tuple[int, int]:
+    """Upload every URL-only product image (and `assets`, key -> URL) once by sending it to
+    `chat_id`, keep the file_ids and delete the messages. Returns (stored, failed)."""
+    async with SessionLocal() as db:
+        todo = [(pid, url, None) for pid, url in await repo.list_products_to_warm(db)]
+    for key, url in (assets or {}).items():
+        if await media.photo(key, url) == url:
+            todo.append((None, url, key))
+
+    bucket = TokenBucket(OUTBOX_CHAT_RATE)  # one chat, so stay under its send limit
+    stored = failed = 0
+    for pid, url, key in todo:
+        await bucket.acquire()
+        try:
+            sent = await bot.send_photo(chat_id, photo=url, disable_notification=True)
+        except TelegramRetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+            try:
+                sent = await bot.send_photo(chat_id, photo=url, disable_notification=True)
+            except Exception:
+                sent = None
+        except Exception:
+            sent = None
+        if sent is None:
+            log.warning("Warm-up failed for %s", key or f"product {pid}")
+            failed += 1
+            continue
+        if key:
+            await media.remember(key, url, sent)
+        else:
+            await media.remember_product(pid, sent)
+        stored += 1
+        try:
+            await bot.delete_message(chat_id, sent.message_id)
+        except Exception:
+            pass
+    return stored, failed
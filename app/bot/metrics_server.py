@@ -0,0 +1,37 @@
+import logging
+from aiohttp import web
+from app.core.config import METRICS_HOST, METRICS_PORT
+from app.core.metrics import render
+
+log = logging.getLogger("ecombot.metrics")
+
+class MetricsServer:
+    """GET /metrics in Prometheus text format; started/stopped with the dispatcher."""
+
+    def __init__(self, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        self.host, self.port = host, port
+        self._runner: web.AppRunner | None = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        try:
+            await web.TCPSite(self._runner, self.host, self.port).start()
+        except OSError as e:
+            # metrics must never keep the bot from starting
+            log.warning("Metrics endpoint disabled, can't listen on %s:%s (%s)", self.host, self.port, e)
+            await self._runner.cleanup()
+            self._runner = None
+            return
+        log.info("Metrics on http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
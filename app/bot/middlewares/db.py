@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.types import TelegramObject, Update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import IDENTITY_CACHE_SIZE
+from app.db.base import SessionLocal
+from app.db import repo
+
+class IdentityCache:
+    """Bounded LRU of Telegram user id -> internal users.id."""
+
+    def __init__(self, maxsize: int = IDENTITY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._ids: OrderedDict[int, int] = OrderedDict()
+
+    def get(self, tg_id: int) -> int | None:
+        user_id = self._ids.get(tg_id)
+        if user_id is not None:
+            self._ids.move_to_end(tg_id)
+        return user_id
+
+    def put(self, tg_id: int, user_id: int):
+        self._ids[tg_id] = user_id
+        self._ids.move_to_end(tg_id)
+        if len(self._ids) > self.maxsize:
+            self._ids.popitem(last=False)
+
+# the current update's session, for ReleaseDbMiddleware
+_update_db: ContextVar[AsyncSession | None] = ContextVar("ecombot_update_db", default=None)
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Outer update middleware:
+    - one AsyncSession per update as `db` (no connection is taken until the first query)
+    - resolved internal user id as `user_id` for messages and button presses
+      (LRU cache first, DB only on a miss); inline queries don't create user rows
+    """
+
+    def __init__(self, identities: IdentityCache | None = None):
+        self.identities = identities or IdentityCache()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        async with SessionLocal() as db:
+            data["db"] = db
+            tg_user = data.get("event_from_user")
+            if tg_user is not None and _identifies_user(event):
+                user_id = self.identities.get(tg_user.id)
+                if user_id is None:
+                    user_id = await repo.get_or_create_user_id(db, tg_user.id)
+                    self.identities.put(tg_user.id, user_id)
+                data["user_id"] = user_id
+            token = _update_db.set(db)
+            try:
+                return await handler(event, data)
+            finally:
+                _update_db.reset(token)
+
+def _identifies_user(event: TelegramObject) -> bool:
+    return isinstance(event, Update) and (event.message is not None or event.callback_query is not None)
+
+class ReleaseDbMiddleware(BaseRequestMiddleware):
+    """
+    Bot session middleware: ends the current update's DB transaction before each Bot API
+    call, so its pooled connection goes back to the pool instead of waiting on Telegram.
+    The next query in the handler checks one out again.
+    """
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot, method: TelegramMethod):
+        db = _update_db.get()
+        if db is not None and db.in_transaction():
+            await db.commit()  # repo writes commit themselves, so this only ends reads
+        return await make_request(bot, method)
@@ -0,0 +1,74 @@
+from time import perf_counter
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.types import TelegramObject, Update
+
+from app.core.metrics import Counter, Gauge, Histogram
+
+UPDATES = Counter("ecombot_updates_total", "Updates received by type", ("type",))
+IN_FLIGHT = Gauge("ecombot_updates_in_flight", "Updates being handled right now")
+HANDLER_SECONDS = Histogram("ecombot_handler_seconds", "Handler latency", ("handler",))
+HANDLER_ERRORS = Counter("ecombot_handler_errors_total", "Handler exceptions", ("handler", "error"))
+API_SECONDS = Histogram("ecombot_bot_api_seconds", "Bot API call latency by method", ("method",))
+API_ERRORS = Counter("ecombot_bot_api_errors_total", "Failed Bot API calls", ("method", "error"))
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Outer update middleware: update counts by type and the in-flight gauge."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if isinstance(event, Update):
+            try:
+                UPDATES.inc(event.event_type)
+            except LookupError:  # update kind this aiogram doesn't know
+                UPDATES.inc("unknown")
+        IN_FLIGHT.inc()
+        try:
+            return await handler(event, data)
+        finally:
+            IN_FLIGHT.dec()
+
+def _handler_name(data: dict[str, Any]) -> str:
+    # e.g. "catalog.on_product"
+    callback = data["handler"].callback
+    return f"{callback.__module__.rsplit('.', 1)[-1]}.{callback.__name__}"
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware (runs only once a handler matched): latency and errors per handler."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        name = _handler_name(data)
+        t0 = perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            HANDLER_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(perf_counter() - t0, name)
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Bot session middleware: latency and errors of every Bot API call by method."""
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot, method: TelegramMethod):
+        name = method.__api_method__
+        t0 = perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            API_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            API_SECONDS.observe(perf_counter() - t0, name)
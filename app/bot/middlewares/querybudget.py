@@ -0,0 +1,60 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from app.core.config import QUERY_BUDGET_MODE, QUERY_BUDGET_DEFAULT
+from app.db.profiling import track_queries, current_scope
+from app.bot.middlewares.metrics import _handler_name
+
+# statements allowed per update for the hot handlers (identity lookup and FSM state
+# read on cold caches included); everything else gets QUERY_BUDGET_DEFAULT
+HANDLER_BUDGETS: dict[str, int] = {
+    "catalog.on_category": 4,
+    "catalog.on_category_page": 4,
+    "catalog.on_product": 4,
+    "catalog.back_to_products": 4,
+    "catalog.back_to_categories": 4,
+    "cart.on_add_to_cart": 4,
+    "cart.change_qty": 4,
+    "cart.remove_item": 4,
+    "cart.cmd_cart": 3,
+    "checkout.finalize": 10,
+}
+
+class QueryBudgetMiddleware(BaseMiddleware):
+    """
+    Outer update middleware: every statement of the update is counted in one
+    scope (see app/db/profiling.py). Over budget or N+1-like repeats are logged
+    or raised per QUERY_BUDGET_MODE.
+    """
+
+    def __init__(self, mode: str = QUERY_BUDGET_MODE):
+        self.mode = mode
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if self.mode == "off":
+            return await handler(event, data)
+        name = f"update:{event.event_type}" if isinstance(event, Update) else "update"
+        with track_queries(name, QUERY_BUDGET_DEFAULT, mode=self.mode):
+            return await handler(event, data)
+
+class QueryScopeHandlerMiddleware(BaseMiddleware):
+    """Inner middleware: names the update's scope after the handler and applies its budget."""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        scope = current_scope()
+        if scope is not None:
+            scope.name = _handler_name(data)
+            scope.budget = HANDLER_BUDGETS.get(scope.name, scope.budget)
+        return await handler(event, data)
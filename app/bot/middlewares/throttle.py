@@ -0,0 +1,127 @@
+import asyncio
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.middleware import FSMContextMiddleware
+from aiogram.types import TelegramObject, Update
+
+from app.core.config import (
+    ADMIN_IDS, THROTTLE_RATE, THROTTLE_BURST, THROTTLE_MAX_USERS, WRITE_CONCURRENCY, WRITE_WAIT,
+)
+from app.bot.ratelimit import TokenBucket
+from app.core.metrics import Counter as MetricCounter
+
+# callback_data prefix -> (token cost, handler writes to the DB); first match wins
+CALLBACK_COSTS: tuple[tuple[str, float, bool], ...] = (
+    ("add:", 2, True),
+    ("qty:", 1, True),
+    ("rm:", 1, True),
+    ("co:", 2, True),       # checkout confirm/cancel (creates the order)
+    ("checkout", 1, False),
+    ("srch:", 1, False),
+    ("catp:", 0.5, False),
+    ("cat:", 0.5, False),
+    ("prod:", 0.5, False),
+    ("back:", 0.5, False),
+)
+CALLBACK_DEFAULT = 1
+MESSAGE_COST = 1
+INLINE_COST = 0.25      # served from memory; fires per keystroke
+
+THROTTLED = MetricCounter("ecombot_throttled_total", "Updates rejected by the throttle", ("reason",))
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Outer update middleware, registered before aiogram's FSM middleware and
+    DbSessionMiddleware so rejected updates never read FSM state or open a DB session:
+    - per-user token buckets; excess callbacks get an instant "slow down" answer,
+      excess messages get a short reply while the user is in a flow (checkout, admin
+      edits; known from the FSM storage's cache only, see `fsm`) so typed input isn't
+      lost silently, other excess messages and inline queries are dropped
+    - at most WRITE_CONCURRENCY write handlers at once (SQLite has one writer)
+    - buckets are evicted LRU-first once refilled, hard-capped at max_users
+    - `counters` counts throttled / busy events by kind
+    """
+
+    def __init__(self, rate: float = THROTTLE_RATE, burst: float = THROTTLE_BURST,
+                 max_users: int = THROTTLE_MAX_USERS, write_concurrency: int = WRITE_CONCURRENCY,
+                 write_wait: float = WRITE_WAIT, fsm: FSMContextMiddleware | None = None):
+        self.rate, self.burst, self.max_users = rate, burst, max_users
+        self.fsm = fsm
+        self.write_wait = write_wait
+        self._writes = asyncio.Semaphore(write_concurrency)
+        self._buckets: OrderedDict[int, TokenBucket] = OrderedDict()
+        self.counters: Counter[str] = Counter()
+
+    def _bucket(self, tg_id: int) -> TokenBucket:
+        bucket = self._buckets.get(tg_id)
+        if bucket is not None:
+            self._buckets.move_to_end(tg_id)
+            return bucket
+        self._evict()
+        bucket = self._buckets[tg_id] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    def _evict(self):
+        # oldest buckets go first; a full bucket holds no state worth keeping
+        while self._buckets:
+            tg_id, bucket = next(iter(self._buckets.items()))
+            if len(self._buckets) < self.max_users and not bucket.is_full():
+                break
+            del self._buckets[tg_id]
+
+    def _in_flow(self, data: dict[str, Any]) -> bool:
+        # cached FSM state only: a user typing fast enough to be throttled was just read
+        peek = getattr(self.fsm.storage, "peek_state", None) if self.fsm is not None else None
+        if peek is None:
+            return False
+        ctx = self.fsm.resolve_event_context(data["bot"], data)
+        return ctx is not None and peek(ctx.key) is not None
+
+    @staticmethod
+    def _classify(update: Update) -> tuple[str, float, bool]:
+        # (kind, cost, writes)
+        if update.callback_query is not None:
+            data = update.callback_query.data or ""
+            for prefix, cost, writes in CALLBACK_COSTS:
+                if data.startswith(prefix):
+                    return "callback", cost, writes
+            return "callback", CALLBACK_DEFAULT, False
+        if update.inline_query is not None:
+            return "inline", INLINE_COST, False
+        return "message", MESSAGE_COST, False
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        tg_user = data.get("event_from_user")
+        if tg_user is None or tg_user.id in ADMIN_IDS or not isinstance(event, Update):
+            return await handler(event, data)
+
+        kind, cost, writes = self._classify(event)
+        if self._bucket(tg_user.id).try_take(cost) > 0:
+            self.counters[f"throttled_{kind}"] += 1
+            THROTTLED.inc(kind)
+            if kind == "callback":
+                await event.callback_query.answer("Too fast — please slow down a bit 🙂")
+            elif kind == "message" and event.message is not None and self._in_flow(data):
+                await event.message.answer("Too fast — please send that again in a moment 🙂")
+            return None
+
+        if not writes:
+            return await handler(event, data)
+        try:
+            await asyncio.wait_for(self._writes.acquire(), self.write_wait)
+        except asyncio.TimeoutError:
+            self.counters["write_busy"] += 1
+            THROTTLED.inc("write_busy")
+            await event.callback_query.answer("Busy right now, please try again", show_alert=True)
+            return None
+        try:
+            return await handler(event, data)
+        finally:
+            self._writes.release()
@@ -0,0 +1,58 @@
+from aiogram import types
+from aiogram.client.default import Default
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InputMediaPhoto
+
+# Screen transitions on the message a button was pressed on. Telegram can edit
+# photo -> photo (editMessageMedia) and text -> text (editMessageText), but a
+# text message can't gain a photo and a photo can't lose it, so only those
+# cases (and failed edits) fall back to sending a new message and deleting the old.
+
+def _not_modified(e: TelegramBadRequest) -> bool:
+    # same content pressed twice; the screen is already right
+    return "message is not modified" in str(e)
+
+async def _replace(message: types.Message, sent: types.Message) -> types.Message:
+    try:
+        await message.delete()
+    except Exception:
+        pass
+    return sent
+
+async def show_photo(message: types.Message, photo: str, caption: str, reply_markup=None,
+                     parse_mode: str | Default = Default("parse_mode"), edit: bool = True) -> types.Message:
+    """Turn `message` into a photo screen (edit=False: reply with a new one).
+    Raises if Telegram refuses the photo itself."""
+    if not edit:
+        return await message.answer_photo(photo=photo, caption=caption, reply_markup=reply_markup, parse_mode=parse_mode)
+    if getattr(message, "photo", None):
+        try:
+            res = await message.edit_media(
+                InputMediaPhoto(media=photo, caption=caption, parse_mode=parse_mode),
+                reply_markup=reply_markup,
+            )
+            return res if isinstance(res, types.Message) else message
+        except TelegramBadRequest as e:
+            if _not_modified(e):
+                return message
+        except Exception:
+            pass
+    sent = await message.answer_photo(photo=photo, caption=caption, reply_markup=reply_markup, parse_mode=parse_mode)
+    return await _replace(message, sent)
+
+async def show_text(message: types.Message, text: str, reply_markup=None,
+                    parse_mode: str | Default = Default("parse_mode"), edit: bool = True) -> types.Message:
+    """Turn `message` into a text screen (edit=False: reply with a new one)."""
+    if not edit:
+        return await message.answer(text, reply_markup=reply_markup, parse_mode=parse_mode)
+    if not getattr(message, "photo", None):
+        try:
+            res = await message.edit_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+            return res if isinstance(res, types.Message) else message
+        except TelegramBadRequest as e:
+            if _not_modified(e):
+                return message
+        except Exception:
+            pass
+    sent = await message.answer(text, reply_markup=reply_markup, parse_mode=parse_mode)
+    return await _replace(message, sent)
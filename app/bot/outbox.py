@@ -0,0 +1,138 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from time import monotonic
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest
+
+from app.core.config import (
+    OUTBOX_GLOBAL_RATE,
+    OUTBOX_CHAT_RATE,
+    OUTBOX_BATCH,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_POLL_INTERVAL,
+)
+from app.db.base import SessionLocal
+from app.db import repo
+from app.bot.ratelimit import TokenBucket
+
+log = logging.getLogger("ecombot.outbox")
+
+# drop idle per-chat buckets once we track more chats than this
+_MAX_CHAT_BUCKETS = 10_000
+
+class OutboxSender:
+    """
+    Background delivery of rows from the `outbox` table.
+    Handlers only enqueue and call notify(); rows tied to a change go in with it
+    (repo.create_order / repo.set_order_status notify=...).
+    - global + per-chat token buckets keep us under Telegram flood limits
+    - 429 RetryAfter pauses all sending and reschedules the message
+    - blocked bot / bad request -> dropped; other errors -> exponential backoff
+    """
+
+    def __init__(self):
+        self.global_bucket = TokenBucket(OUTBOX_GLOBAL_RATE)
+        self._chats: dict[int, TokenBucket] = {}
+        self._paused_until = 0.0
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+
+    def notify(self):
+        # new rows were enqueued in this process; skip the idle wait
+        self._wake.set()
+
+    async def start(self, bot: Bot):
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(bot))
+
+    async def stop(self, timeout: float = 10):
+        if not self._task:
+            return
+        self._stopping = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            # unsent rows stay leased in the table and are retried on next start
+            self._task.cancel()
+        self._task = None
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= _MAX_CHAT_BUCKETS:
+                self._chats = {k: b for k, b in self._chats.items() if not b.is_full()}
+            bucket = self._chats[chat_id] = TokenBucket(OUTBOX_CHAT_RATE)
+        return bucket
+
+    async def _run(self, bot: Bot):
+        next_retry: datetime | None = None
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                async with SessionLocal() as db:
+                    batch = await repo.claim_outbox(db, OUTBOX_BATCH)
+                if batch:
+                    done, retries = await self._send_batch(bot, batch)
+                    async with SessionLocal() as db:
+                        await repo.finish_outbox(db, done, retries)
+                    if retries:
+                        soonest = min(r["next_attempt_at"] for r in retries)
+                        next_retry = soonest if next_retry is None else min(next_retry, soonest)
+                    continue
+            except Exception:
+                log.exception("Outbox round failed")
+            # idle: sleep until the earliest known retry, a notify(), or the poll interval
+            timeout = OUTBOX_POLL_INTERVAL
+            if next_retry is not None:
+                timeout = min(timeout, max((next_retry - datetime.utcnow()).total_seconds(), 0.05))
+                next_retry = None
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send_batch(self, bot: Bot, batch):
+        done: list[int] = []
+        retries: list[dict] = []
+
+        def later(m, seconds: float, attempts: int):
+            retries.append({
+                "id": m.id,
+                "attempts": attempts,
+                "next_attempt_at": datetime.utcnow() + timedelta(seconds=seconds),
+            })
+
+        for m in batch:
+            pause = self._paused_until - monotonic()
+            if pause > 0 or self._stopping:
+                later(m, max(pause, 0), m.attempts)
+                continue
+            wait = self._chat_bucket(m.chat_id).try_take()
+            if wait > 0:
+                later(m, wait, m.attempts)
+                continue
+            await self.global_bucket.acquire()
+            try:
+                await bot.send_message(m.chat_id, m.text)
+                done.append(m.id)
+            except TelegramRetryAfter as e:
+                log.warning("Flood control, pausing outbox for %ss", e.retry_after)
+                self._paused_until = monotonic() + e.retry_after
+                later(m, e.retry_after, m.attempts)
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                log.warning("Dropping outbox message %s to %s: %s", m.id, m.chat_id, e)
+                done.append(m.id)
+            except Exception as e:
+                attempts = m.attempts + 1
+                if attempts >= OUTBOX_MAX_ATTEMPTS:
+                    log.error("Giving up on outbox message %s to %s: %s", m.id, m.chat_id, e)
+                    done.append(m.id)
+                else:
+                    later(m, min(2 ** attempts, 300), attempts)
+        return done, retries
+
+outbox = OutboxSender()
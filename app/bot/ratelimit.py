@@ -0,0 +1,34 @@
+import asyncio
+from time import monotonic
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/sec, bursts up to `capacity`."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = monotonic()
+
+    def _refill(self):
+        now = monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, cost: float = 1.0) -> float:
+        # take tokens if available -> 0.0, else seconds until they would be
+        self._refill()
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    async def acquire(self, cost: float = 1.0):
+        while (wait := self.try_take(cost)) > 0:
+            await asyncio.sleep(wait)
+
+    def is_full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
@@ -0,0 +1,40 @@
+from collections import OrderedDict
+from app.core.config import RENDER_CACHE_SIZE
+from app.core.metrics import Collected
+
+class RenderCache:
+    """Bounded LRU of finished keyboards/captions for one catalog version."""
+
+    def __init__(self, maxsize: int = RENDER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.version = -1
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict = OrderedDict()
+
+    def get(self, version: int, key, build):
+        # a newer catalog version makes every entry stale at once
+        if version > self.version:
+            self._items.clear()
+            self.version = version
+        elif version < self.version:
+            # caller rendered from an older snapshot; don't pollute the cache
+            return build()
+
+        try:
+            value = self._items[key]
+        except KeyError:
+            self.misses += 1
+            value = self._items[key] = build()
+            if len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+            return value
+        self.hits += 1
+        self._items.move_to_end(key)
+        return value
+
+render_cache = RenderCache()
+
+# read at scrape time, so the hot path stays plain attribute increments
+Collected("ecombot_render_cache_lookups_total", "Render cache lookups by result", ("result",),
+          lambda: {("hit",): render_cache.hits, ("miss",): render_cache.misses}, kind="counter")
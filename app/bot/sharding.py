@@ -0,0 +1,334 @@
+import asyncio
+import logging
+import multiprocessing as mp
+import queue
+import signal
+import threading
+import time
+
+from aiogram import Bot
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import Update
+
+from app.core.config import (
+    BOT_MODE,
+    METRICS_PORT,
+    SHARD_QUEUE_SIZE,
+    SHARD_CONCURRENCY,
+    SHARD_HEARTBEAT_TIMEOUT,
+    WEBHOOK_DRAIN_TIMEOUT,
+)
+
+log = logging.getLogger("ecombot.shards")
+
+# an update whose worker died this many times while it was pending is dropped
+_MAX_DELIVERIES = 3
+
+# Supervisor mode (BOT_WORKERS > 1): this process receives updates (long polling
+# or webhook) and hands each one to worker `user_id % N` over a pipe. The worker
+# acks each update once handled; the supervisor keeps unacked ones and re-sends
+# them to a restarted worker (at-least-once delivery).
+# A user's updates always land on the same worker, in order, so its FSM cache,
+# identity cache and throttle bucket stay local. Workers run the normal
+# dispatcher; only worker 0 runs background jobs (outbox, FSM cleanup).
+# Catalog edits made in one worker reach the others through a shared counter
+# (CatalogCache.attach_shared / sync).
+
+def _user_key(update: Update) -> int:
+    # user id, or chat id for user-less updates (channel posts)
+    ctx = UserContextMiddleware.resolve_event_context(update)
+    return ctx.user.id if ctx.user else ctx.chat.id if ctx.chat else 0
+
+def shard_of(update: Update, workers: int) -> int:
+    # Telegram ids are spread evenly enough that modulo is the hash
+    return _user_key(update) % workers
+
+# ---------- worker process ----------
+def _worker_main(index: int, inbox, acks, catalog_changes, heartbeats):
+    try:
+        asyncio.run(_run_worker(index, inbox, acks, catalog_changes, heartbeats))
+    except KeyboardInterrupt:
+        pass
+
+async def _run_worker(index: int, inbox, acks, catalog_changes, heartbeats):
+    from app.bot.main import make_bot, build_dispatcher
+    from app.db.cache import catalog
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the supervisor decides when we stop
+    catalog.attach_shared(catalog_changes)
+    bot = make_bot()
+    dp = build_dispatcher(background=index == 0, metrics_port=METRICS_PORT + index if METRICS_PORT else 0)
+    await dp.emit_startup(bot=bot)
+
+    async def beat():
+        while True:
+            heartbeats[index] = time.time()
+            await asyncio.sleep(1)
+
+    # a slot is taken before each inbox.recv and held until that update is handled, so at
+    # most SHARD_CONCURRENCY updates are read at once; the rest wait in the pipe or the
+    # supervisor, which holds every update until it is acked
+    slots = asyncio.Semaphore(SHARD_CONCURRENCY)
+    inflight: set[asyncio.Task] = set()
+    lanes: dict[int, asyncio.Task] = {}  # user key -> last task; keeps per-user order
+
+    async def handle(update: Update, prev: asyncio.Task | None):
+        try:
+            if prev is not None:
+                await asyncio.wait([prev])
+            catalog.sync()
+            try:
+                await dp.feed_update(bot, update)
+            except Exception:
+                log.exception("Worker %s: update %s failed", index, update.update_id)
+        finally:
+            slots.release()
+            _ack(acks, update.update_id)
+
+    beater = asyncio.create_task(beat())
+    log.info("Worker %s started", index)
+    try:
+        while True:
+            await slots.acquire()
+            try:
+                raw = await asyncio.to_thread(inbox.recv)
+            except EOFError:  # supervisor is gone
+                slots.release()
+                break
+            if raw is None:  # stop sentinel, everything before it is already sent
+                slots.release()
+                break
+            update = Update.model_validate_json(raw, context={"bot": bot})
+            key = _user_key(update)
+            task = asyncio.create_task(handle(update, lanes.get(key)))
+            inflight.add(task)
+            task.add_done_callback(inflight.discard)
+            lanes[key] = task
+            task.add_done_callback(lambda t, k=key: _drop_lane(lanes, k, t))
+    finally:
+        # finish what was already read before shutting down
+        if inflight:
+            await asyncio.wait(list(inflight))
+        beater.cancel()
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
+        log.info("Worker %s stopped", index)
+
+def _ack(acks, update_id: int):
+    # a tiny message; the supervisor drains acks in a thread of its own, so this doesn't block
+    try:
+        acks.send(update_id)
+    except OSError:  # supervisor is gone
+        pass
+
+def _drop_lane(lanes: dict[int, asyncio.Task], key: int, task: asyncio.Task):
+    # forget a user's lane once its newest update is done
+    if lanes.get(key) is task:
+        del lanes[key]
+
+# ---------- supervisor ----------
+class _Channel:
+    """
+    Pipes to one worker incarnation: updates in, acks (handled update ids) out.
+    A worker killed mid-read leaves nothing behind to block the next one, which
+    gets a new channel; each end is served by its own supervisor thread.
+    """
+
+    def __init__(self, ctx, on_ack):
+        self.inbox, self._updates = ctx.Pipe(duplex=False)
+        self._acks, self.acks = ctx.Pipe(duplex=False)
+        self.outgoing: queue.SimpleQueue = queue.SimpleQueue()
+        self._on_ack = on_ack
+
+    def open(self):
+        # after the worker started: drop our copies of its ends so its death reads as EOF here
+        self.inbox.close()
+        self.acks.close()
+        threading.Thread(target=self._send, daemon=True).start()
+        threading.Thread(target=self._receive, daemon=True).start()
+
+    def close(self):
+        # ends the sender thread; pass None through to the worker as its stop sentinel
+        self.outgoing.put(None)
+
+    def _send(self):
+        while True:
+            raw = self.outgoing.get()
+            try:
+                self._updates.send(raw)
+            except OSError:  # worker is gone; the supervisor re-sends its pending updates
+                break
+            if raw is None:
+                break
+        self._updates.close()
+
+    def _receive(self):
+        while True:
+            try:
+                update_id = self._acks.recv()
+            except (EOFError, OSError):  # worker is gone
+                break
+            self._on_ack(update_id)
+        self._acks.close()
+
+class Supervisor:
+    """
+    Starts N worker processes, routes updates to them and keeps them alive:
+    a worker that exits, or whose heartbeat is older than SHARD_HEARTBEAT_TIMEOUT,
+    is restarted on a new channel and gets the updates it had not acked again.
+    """
+
+    def __init__(self, workers: int):
+        self.n = workers
+        self.ctx = mp.get_context("spawn")
+        self.channels: list[_Channel | None] = [None] * workers
+        # update_id -> [raw json, deliveries], in routing order, until the worker acks it
+        self.pending: list[dict[int, list]] = [{} for _ in range(workers)]
+        self.space = [asyncio.Semaphore(SHARD_QUEUE_SIZE) for _ in range(workers)]
+        self.catalog_changes = self.ctx.Value("q", 0)
+        self.heartbeats = self.ctx.Array("d", workers)
+        self.procs: list[mp.Process | None] = [None] * workers
+        self.restarts = [0] * workers
+        self.loop: asyncio.AbstractEventLoop | None = None
+
+    def _spawn(self, i: int):
+        if self.channels[i] is not None:
+            self.channels[i].close()
+        ch = self.channels[i] = _Channel(self.ctx, lambda update_id: self._ack_threadsafe(i, update_id))
+        self.heartbeats[i] = time.time() + SHARD_HEARTBEAT_TIMEOUT  # double the timeout while it boots
+        p = self.ctx.Process(
+            target=_worker_main,
+            args=(i, ch.inbox, ch.acks, self.catalog_changes, self.heartbeats),
+            name=f"ecombot-worker-{i}",
+            daemon=True,
+        )
+        p.start()
+        ch.open()
+        self.procs[i] = p
+        # whatever the previous incarnation had not acked, in the original order
+        for update_id, entry in list(self.pending[i].items()):
+            if entry[1] >= _MAX_DELIVERIES:
+                log.error("Dropping update %s: worker %s died %s times handling it", update_id, i, entry[1])
+                self._ack(i, update_id)
+                continue
+            entry[1] += 1
+            ch.outgoing.put(entry[0])
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        for i in range(self.n):
+            self._spawn(i)
+
+    def _ack_threadsafe(self, i: int, update_id: int):
+        try:
+            self.loop.call_soon_threadsafe(self._ack, i, update_id)
+        except RuntimeError:  # loop closed during shutdown
+            pass
+
+    def _ack(self, i: int, update_id: int):
+        if self.pending[i].pop(update_id, None) is not None:
+            self.space[i].release()
+
+    async def route(self, update: Update):
+        # waits while that worker has SHARD_QUEUE_SIZE unacked updates: backpressure to the receiver
+        i = shard_of(update, self.n)
+        await self.space[i].acquire()
+        if update.update_id in self.pending[i]:  # Telegram re-sent it; the first copy is on its way
+            self.space[i].release()
+            return
+        raw = update.model_dump_json(exclude_unset=True)
+        self.pending[i][update.update_id] = [raw, 1]
+        self.channels[i].outgoing.put(raw)
+
+    async def monitor(self, stop: asyncio.Event):
+        while not stop.is_set():
+            now = time.time()
+            for i, p in enumerate(self.procs):
+                if p.is_alive() and now - self.heartbeats[i] <= SHARD_HEARTBEAT_TIMEOUT:
+                    continue
+                if p.is_alive():
+                    log.error("Worker %s unresponsive for %.0fs, restarting", i, now - self.heartbeats[i])
+                    p.kill()
+                    await asyncio.to_thread(p.join)
+                else:
+                    log.error("Worker %s exited with code %s, restarting", i, p.exitcode)
+                self.restarts[i] += 1
+                # back off a crash-looping worker (up to 30s between restarts)
+                await asyncio.sleep(min(30, 2 ** min(self.restarts[i], 5) / 4))
+                self._spawn(i)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=1)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self, drain_timeout: float = WEBHOOK_DRAIN_TIMEOUT):
+        # sentinel after the pending updates, then wait for workers to finish them
+        for ch in self.channels:
+            ch.close()
+        deadline = time.monotonic() + drain_timeout
+        for i, p in enumerate(self.procs):
+            await asyncio.to_thread(p.join, max(0.0, deadline - time.monotonic()))
+            if p.is_alive():
+                log.warning("Worker %s did not drain in time, terminating", i)
+                p.terminate()
+                p.join()
+
+    def health(self) -> list[dict]:
+        now = time.time()
+        return [
+            {"worker": i, "alive": p.is_alive(), "heartbeat_age": round(now - self.heartbeats[i], 1),
+             "restarts": self.restarts[i], "queued": len(self.pending[i])}
+            for i, p in enumerate(self.procs)
+        ]
+
+async def _poll(bot: Bot, sup: Supervisor, allowed_updates: list[str], stop: asyncio.Event):
+    # long polling in the supervisor; the offset only advances once an update is routed
+    offset = None
+    while not stop.is_set():
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=25, allowed_updates=allowed_updates)
+        except TelegramRetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+            continue
+        except Exception:
+            log.exception("getUpdates failed")
+            await asyncio.sleep(1)
+            continue
+        for update in updates:
+            await sup.route(update)
+            offset = update.update_id + 1
+
+async def run_supervisor(workers: int):
+    from app.bot.main import make_bot, build_dispatcher
+    from app.bot.webhook import run_webhook
+
+    sup = Supervisor(workers)
+    sup.start()
+    log.info("Supervisor started %s workers", workers)
+
+    bot = make_bot()
+    dp = build_dispatcher(background=False, metrics_port=0)  # only for allowed update types; never fed
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(sup.monitor(stop))
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook(bot, dp, feed=sup.route)
+        else:
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.add_signal_handler(sig, stop.set)
+                except NotImplementedError:  # Windows
+                    pass
+            await bot.delete_webhook(drop_pending_updates=True)
+            poller = asyncio.create_task(_poll(bot, sup, dp.resolve_used_update_types(), stop))
+            await stop.wait()
+            poller.cancel()
+            await asyncio.gather(poller, return_exceptions=True)
+            await bot.session.close()
+    finally:
+        stop.set()
+        await monitor
+        log.info("Stopping workers: %s", sup.health())
+        await sup.stop()
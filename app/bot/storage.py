@@ -0,0 +1,173 @@
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from time import monotonic
+from typing import Any, Mapping
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.exceptions import DataNotDictLikeError
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.core.config import FSM_TTL, FSM_CACHE_SIZE, FSM_CACHE_TTL, FSM_CLEANUP_INTERVAL, FSM_CLEANUP_BATCH
+from app.db.base import SessionLocal
+from app.db import models
+
+log = logging.getLogger("ecombot.fsm")
+
+def _key(key: StorageKey) -> str:
+    return ":".join(str(p) if p is not None else "" for p in (
+        key.bot_id, key.chat_id, key.user_id, key.thread_id, key.business_connection_id, key.destiny,
+    ))
+
+class SqliteStorage(BaseStorage):
+    """
+    FSM storage in the fsm_states table, so flows survive restarts.
+
+    Writes go to the DB first, then to an in-memory LRU; reads (one per update,
+    from aiogram's FSM middleware) are served from the LRU, including "no state".
+    A cached entry is trusted for `cache_ttl` seconds after it was read or written,
+    then read from the DB again, so a state written by another instance is seen
+    within that time. When every chat is always handled by the same process (one
+    instance, or the sharded runner) it can be as long as `ttl`.
+    Flows untouched for `ttl` seconds read as empty and are deleted in batches
+    by a background task.
+    """
+
+    def __init__(self, ttl: int = FSM_TTL, cache_size: int = FSM_CACHE_SIZE, cache_ttl: float = FSM_CACHE_TTL,
+                 cleanup_interval: float = FSM_CLEANUP_INTERVAL, cleanup_batch: int = FSM_CLEANUP_BATCH):
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.cleanup_interval = cleanup_interval
+        self.cleanup_batch = cleanup_batch
+        # key -> (state, data json, monotonic time of last write, monotonic time cached)
+        self._cache: OrderedDict[str, tuple[str | None, str, float, float]] = OrderedDict()
+        self._task: asyncio.Task | None = None
+
+    # ---------- cache ----------
+    def _cached(self, k: str):
+        rec = self._cache.get(k)
+        if rec is None:
+            return None
+        now = monotonic()
+        if now - rec[3] > self.cache_ttl:
+            return None  # another instance may have changed it; read the DB again
+        if now - rec[2] > self.ttl:
+            return None, "{}", rec[2]
+        self._cache.move_to_end(k)
+        return rec[:3]
+
+    def _put(self, k: str, state: str | None, data: str, touched: float):
+        self._cache[k] = (state, data, touched, monotonic())
+        self._cache.move_to_end(k)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _load(self, k: str) -> tuple[str | None, str, float]:
+        rec = self._cached(k)
+        if rec is not None:
+            return rec
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+        async with SessionLocal() as db:
+            row = (await db.execute(
+                select(models.FsmRecord.state, models.FsmRecord.data, models.FsmRecord.updated_at)
+                .where(models.FsmRecord.key == k, models.FsmRecord.updated_at >= cutoff)
+            )).first()
+        if row is None:
+            rec = (None, "{}", monotonic())
+        else:
+            # carry the row's age over so the TTL keeps counting from the last write
+            age = (datetime.utcnow() - row.updated_at).total_seconds()
+            rec = (row.state, row.data, monotonic() - age)
+        self._put(k, *rec)
+        return rec
+
+    async def _write(self, k: str, state: str | None, data: str):
+        async with SessionLocal() as db:
+            if state is None and data == "{}":
+                await db.execute(delete(models.FsmRecord).where(models.FsmRecord.key == k))
+            else:
+                stmt = sqlite_insert(models.FsmRecord).values(
+                    key=k, state=state, data=data, updated_at=datetime.utcnow()
+                )
+                await db.execute(stmt.on_conflict_do_update(
+                    index_elements=[models.FsmRecord.key],
+                    set_={"state": stmt.excluded.state, "data": stmt.excluded.data,
+                          "updated_at": stmt.excluded.updated_at},
+                ))
+            await db.commit()
+        self._put(k, state, data, monotonic())
+
+    def peek_state(self, key: StorageKey) -> str | None:
+        # state from the LRU only, never the DB; None when not cached
+        rec = self._cached(_key(key))
+        return rec[0] if rec is not None else None
+
+    # ---------- BaseStorage ----------
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k = _key(key)
+        _, data, _ = await self._load(k)
+        await self._write(k, state.state if isinstance(state, State) else state, data)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return (await self._load(_key(key)))[0]
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            msg = f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            raise DataNotDictLikeError(msg)
+        k = _key(key)
+        state, _, _ = await self._load(k)
+        await self._write(k, state, json.dumps(data, ensure_ascii=False))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        # decoded per call, so callers can't mutate the cached copy
+        return json.loads((await self._load(_key(key)))[1])
+
+    # ---------- expiry ----------
+    async def cleanup(self) -> int:
+        """Delete expired rows in batches (short write transactions); returns rows removed."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+        removed = 0
+        while True:
+            async with SessionLocal() as db:
+                batch = select(models.FsmRecord.key).where(
+                    models.FsmRecord.updated_at < cutoff
+                ).limit(self.cleanup_batch).scalar_subquery()
+                res = await db.execute(delete(models.FsmRecord).where(models.FsmRecord.key.in_(batch)))
+                await db.commit()
+            removed += res.rowcount
+            if res.rowcount < self.cleanup_batch:
+                break
+            await asyncio.sleep(0)  # let handlers in between batches
+        now = monotonic()
+        for k in [k for k, rec in self._cache.items() if now - rec[2] > self.ttl]:
+            del self._cache[k]
+        return removed
+
+    async def _cleanup_loop(self):
+        while True:
+            try:
+                removed = await self.cleanup()
+                if removed:
+                    log.info("Expired %s FSM records", removed)
+            except Exception:
+                log.exception("FSM cleanup failed")
+            await asyncio.sleep(self.cleanup_interval)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._cleanup_loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import signal
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from app.core.config import (
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_BASE_URL,
+    WEBHOOK_SECRET,
+    WEBHOOK_WORKERS,
+    WEBHOOK_QUEUE_SIZE,
+    WEBHOOK_QUEUE_TIMEOUT,
+    WEBHOOK_DRAIN_TIMEOUT,
+)
+
+log = logging.getLogger("ecombot.webhook")
+
+class WebhookServer:
+    """
+    aiohttp receiver for Telegram webhooks.
+    - POST {path}: parse update, put it on a bounded queue, reply 200 at once
+    - a fixed pool of workers feeds the queue into the Dispatcher (concurrency cap)
+    - queue full for too long -> 503, Telegram retries later (backpressure)
+    - on stop: refuse new updates, drain the queue, then shut down
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        dp: Dispatcher,
+        path: str = WEBHOOK_PATH,
+        workers: int = WEBHOOK_WORKERS,
+        queue_size: int = WEBHOOK_QUEUE_SIZE,
+        secret: str = WEBHOOK_SECRET,
+        feed=None,
+    ):
+        self.bot = bot
+        self.dp = dp
+        # feed(update) replaces dp.feed_update, e.g. to hand updates to shard workers
+        self.feed = feed or (lambda update: dp.feed_update(self.bot, update))
+        self.path = path
+        self.workers = workers
+        self.secret = secret
+        self.queue: asyncio.Queue[Update] = asyncio.Queue(maxsize=queue_size)
+        self.accepting = False
+        self._tasks: list[asyncio.Task] = []
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        app.router.add_get("/healthz", self.handle_health)
+        return app
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if self.secret and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != self.secret:
+            return web.Response(status=401)
+        if not self.accepting:
+            return web.Response(status=503, headers={"Retry-After": "5"})
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception:
+            log.warning("Rejected malformed update")
+            return web.Response(status=400)
+        try:
+            await asyncio.wait_for(self.queue.put(update), timeout=WEBHOOK_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            log.warning("Intake queue full (%s), asking Telegram to retry", self.queue.qsize())
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        return web.Response()
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "accepting": self.accepting,
+            "queued": self.queue.qsize(),
+            "workers": self.workers,
+        })
+
+    async def _worker(self):
+        while True:
+            update = await self.queue.get()
+            try:
+                await self.feed(update)
+            except Exception:
+                log.exception("Update %s failed", update.update_id)
+            finally:
+                self.queue.task_done()
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self.accepting = True
+
+    async def stop(self, drain_timeout: float = WEBHOOK_DRAIN_TIMEOUT):
+        self.accepting = False
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            log.warning("Drain timed out, %s updates dropped", self.queue.qsize())
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+async def run_webhook(bot: Bot, dp: Dispatcher, host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT, feed=None):
+    server = WebhookServer(bot, dp, feed=feed)
+    runner = web.AppRunner(server.make_app())
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+
+    await dp.emit_startup(bot=bot)
+    await server.start()
+    await site.start()
+    if WEBHOOK_BASE_URL:
+        await bot.set_webhook(
+            WEBHOOK_BASE_URL.rstrip("/") + server.path,
+            secret_token=WEBHOOK_SECRET or None,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+    log.info("Webhook server listening on %s:%s%s", host, port, server.path)
+
+    try:
+        await stop.wait()
+    finally:
+        log.info("Stopping webhook server, draining %s queued updates", server.queue.qsize())
+        await server.stop()
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot)
+        await bot.session.close()
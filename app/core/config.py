@@ -9,4 +9,98 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 
 # admin ids as tuple of ints
 _raw = os.getenv("ADMIN_IDS", "")
-ADMIN_IDS = tuple(int(x.strip()) for x in _raw.split(",") if x.strip().isdigit())
\ No newline at end of file
+ADMIN_IDS = tuple(int(x.strip()) for x in _raw.split(",") if x.strip().isdigit())
+
+# max finished keyboards/captions kept by the render cache
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "2048"))
+
+# tg_id -> users.id entries kept in memory by the DB middleware
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", "100000"))
+
+# runtime mode: "polling" (default) or "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
+
+# webhook server (BOT_MODE=webhook)
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")   # public https URL; empty = don't call setWebhook
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")       # checked against X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "32"))          # max updates handled at once
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))  # intake queue bound
+WEBHOOK_QUEUE_TIMEOUT = float(os.getenv("WEBHOOK_QUEUE_TIMEOUT", "2"))  # seconds to wait for a free slot
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "30"))  # seconds to finish queued updates on stop
+
+# outbox sender (admin alerts, customer notifications); defaults follow Telegram bot limits
+OUTBOX_GLOBAL_RATE = float(os.getenv("OUTBOX_GLOBAL_RATE", "25"))   # messages/sec across all chats
+OUTBOX_CHAT_RATE = float(os.getenv("OUTBOX_CHAT_RATE", "1"))        # messages/sec per chat
+OUTBOX_BATCH = int(os.getenv("OUTBOX_BATCH", "50"))                 # rows claimed per round
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))  # seconds between idle DB checks
+
+# rows fetched per round trip by the orders export
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+# database
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///ecom.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# SQLite pragmas applied to every new connection; set a variable to "" to skip that pragma
+DB_PRAGMAS = {
+    k: v for k, v in {
+        "journal_mode": os.getenv("DB_JOURNAL_MODE", "WAL"),         # readers don't block the writer
+        "synchronous": os.getenv("DB_SYNCHRONOUS", "NORMAL"),        # fsync on checkpoint, not every commit
+        "busy_timeout": os.getenv("DB_BUSY_TIMEOUT_MS", "5000"),     # wait for locks instead of failing
+        "mmap_size": os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)),
+        "cache_size": os.getenv("DB_CACHE_SIZE", "-65536"),          # negative = KiB, i.e. 64 MiB
+        "temp_store": os.getenv("DB_TEMP_STORE", "MEMORY"),
+    }.items() if v
+}
+
+# catalog browsing
+CATALOG_PAGE_SIZE = int(os.getenv("CATALOG_PAGE_SIZE", "20"))            # products per keyboard page
+CATALOG_CACHE_PAGES = int(os.getenv("CATALOG_CACHE_PAGES", "2000"))      # cached product-list pages
+CATALOG_CACHE_PRODUCTS = int(os.getenv("CATALOG_CACHE_PRODUCTS", "20000"))  # cached product cards
+
+# rows per page in the admin product/order lists
+ADMIN_PAGE_SIZE = int(os.getenv("ADMIN_PAGE_SIZE", "20"))
+
+# /search results per page
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "10"))
+
+# inline mode (@bot query)
+INLINE_RESULTS = int(os.getenv("INLINE_RESULTS", "20"))        # results per answer (Telegram max 50)
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "60"))  # seconds Telegram may cache an answer
+
+# per-user throttling (token bucket: RATE tokens/sec, bursts up to BURST) and write concurrency
+THROTTLE_RATE = float(os.getenv("THROTTLE_RATE", "2"))
+THROTTLE_BURST = float(os.getenv("THROTTLE_BURST", "8"))
+THROTTLE_MAX_USERS = int(os.getenv("THROTTLE_MAX_USERS", "100000"))  # buckets kept in memory
+WRITE_CONCURRENCY = int(os.getenv("WRITE_CONCURRENCY", "4"))         # write handlers running at once
+WRITE_WAIT = float(os.getenv("WRITE_WAIT", "5"))                     # seconds to wait for a write slot
+
+# FSM storage (checkout/admin flows) in the database
+FSM_TTL = int(os.getenv("FSM_TTL", str(24 * 3600)))            # seconds an untouched flow is kept
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "50000"))       # keys cached in memory
+FSM_CACHE_TTL = float(os.getenv("FSM_CACHE_TTL", "5"))          # seconds a cached state is trusted; raise
+                                                                  # to FSM_TTL when each chat always hits one process
+FSM_CLEANUP_INTERVAL = float(os.getenv("FSM_CLEANUP_INTERVAL", "600"))
+FSM_CLEANUP_BATCH = int(os.getenv("FSM_CLEANUP_BATCH", "500"))   # rows deleted per statement
+
+# worker processes; >1 runs a supervisor that receives updates and shards them by user id
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "1"))
+SHARD_QUEUE_SIZE = int(os.getenv("SHARD_QUEUE_SIZE", "1000"))          # unacked updates per worker
+SHARD_CONCURRENCY = int(os.getenv("SHARD_CONCURRENCY", "32"))          # updates handled at once per worker
+SHARD_HEARTBEAT_TIMEOUT = float(os.getenv("SHARD_HEARTBEAT_TIMEOUT", "30"))  # seconds before a stuck worker is restarted
+
+# Prometheus /metrics endpoint (local only by default); METRICS_PORT=0 turns it off.
+# Shard workers listen on METRICS_PORT + worker index.
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+
+# per-update SQL query budget / N+1 detector: "off", "log" or "raise"
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "log").strip().lower()
+QUERY_BUDGET_DEFAULT = int(os.getenv("QUERY_BUDGET_DEFAULT", "12"))   # statements per update
+QUERY_REPEAT_LIMIT = int(os.getenv("QUERY_REPEAT_LIMIT", "5"))        # same statement shape per update
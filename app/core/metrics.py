@@ -0,0 +1,144 @@
+from bisect import bisect_left
+from time import perf_counter
+
+# Minimal in-process metrics with Prometheus text exposition (no extra dependency).
+# Everything runs on the event loop thread, so updates are plain dict/list writes.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+REGISTRY: list["_Metric"] = []
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        REGISTRY.append(self)
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def expose(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name}{_labels(names, values)} {value}" for name, names, values, value in self._samples()]
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def _samples(self):
+        for labels, v in self.values.items():
+            yield self.name, self.labelnames, labels, v
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        self.series: dict[tuple, list] = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *labels):
+        s = self.series.get(labels)
+        if s is None:
+            s = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        s[bisect_left(self.buckets, value)] += 1
+        s[-1] += value
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def _samples(self):
+        names = self.labelnames + ("le",)
+        for labels, s in self.series.items():
+            total = 0
+            for le, n in zip(self.buckets + ("+Inf",), s):
+                total += n
+                yield f"{self.name}_bucket", names, labels + (le,), total
+            yield f"{self.name}_sum", self.labelnames, labels, round(s[-1], 6)
+            yield f"{self.name}_count", self.labelnames, labels, total
+
+class _Timer:
+    __slots__ = ("h", "labels", "t0")
+
+    def __init__(self, h: Histogram, labels: tuple):
+        self.h, self.labels = h, labels
+
+    def __enter__(self):
+        self.t0 = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.h.observe(perf_counter() - self.t0, *self.labels)
+
+class Collected(_Metric):
+    """Values read from somewhere else at scrape time: fn() -> {label values tuple: value}."""
+
+    def __init__(self, name, help, labelnames=(), fn=None, kind="gauge"):
+        super().__init__(name, help, labelnames)
+        self.fn, self.kind = fn, kind
+
+    def _samples(self):
+        for labels, v in self.fn().items():
+            yield self.name, self.labelnames, labels, v
+
+def render() -> str:
+    lines = []
+    for m in REGISTRY:
+        lines += m.expose()
+    return "\n".join(lines) + "\n"
+
+# ---------- database ----------
+DB_QUERIES = Histogram("ecombot_db_query_seconds", "SQL statement duration by verb",
+                       ("verb",), QUERY_BUCKETS)
+DB_ERRORS = Counter("ecombot_db_query_errors_total", "Failed SQL statements by verb", ("verb",))
+_VERBS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "PRAGMA", "CREATE", "BEGIN", "COMMIT"}
+
+def _verb(statement: str) -> str:
+    # first keyword only, so the label set stays small
+    words = statement.split(None, 1)
+    verb = words[0].upper() if words else ""
+    return verb if verb in _VERBS else "OTHER"
+
+def instrument_engine(engine):
+    """Count and time every statement on `engine` (an AsyncEngine or Engine)."""
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_t0 = perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        t0 = getattr(context, "_metrics_t0", None)
+        if t0 is not None:
+            DB_QUERIES.observe(perf_counter() - t0, _verb(statement))
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(ctx):
+        DB_ERRORS.inc(_verb(ctx.statement or ""))
@@ -1,19 +1,36 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy import event
 
-DATABASE_URL = "sqlite+aiosqlite:///ecom.db"
+from app.core.config import DATABASE_URL, DB_PRAGMAS, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT
+from app.core.metrics import instrument_engine
+from app.db import profiling
 
-# create engine
-engine = create_async_engine(DATABASE_URL, echo=False, future=True)
+def make_engine(url: str = DATABASE_URL, pragmas: dict[str, str] = DB_PRAGMAS, **kwargs) -> AsyncEngine:
+    # pool sizing only applies to file databases (in-memory SQLite uses a static pool)
+    if ":memory:" not in url:
+        kwargs.setdefault("pool_size", DB_POOL_SIZE)
+        kwargs.setdefault("max_overflow", DB_MAX_OVERFLOW)
+        kwargs.setdefault("pool_timeout", DB_POOL_TIMEOUT)
+    eng = create_async_engine(url, echo=False, future=True, **kwargs)
+
+    if eng.dialect.name == "sqlite":
+        # enable SQLite foreign keys + the tuned pragmas on every connection
+        @event.listens_for(eng.sync_engine, "connect")
+        def _sqlite_pragmas_on_connect(dbapi_connection, connection_record):
+            # called for each DB-API connection
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys=ON")
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
 
-# enable SQLite foreign keys on every connection
-@event.listens_for(engine.sync_engine, "connect")
-def _fk_pragma_on_connect(dbapi_connection, connection_record):
-    # called for each DB-API connection
-    cursor = dbapi_connection.cursor()
-    cursor.execute("PRAGMA foreign_keys=ON")
-    cursor.close()
+    return eng
+
+# create engine
+engine = make_engine()
+instrument_engine(engine)  # query count/latency for /metrics
+profiling.install(engine)  # per-update query budgets
 
 class Base(DeclarativeBase):
     pass
@@ -22,6 +39,10 @@ class Base(DeclarativeBase):
 SessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
 async def init_db():
-    # create tables
+    # create tables, then bring existing databases up to the current schema version
+    from app.db.migrations import migrate
+    from app.db import models  # the tables register on Base when models is imported
+
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(models.Base.metadata.create_all)
+        await migrate(conn)
@@ -0,0 +1,189 @@
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from sqlalchemy import select
+from app.core.config import CATALOG_PAGE_SIZE, CATALOG_CACHE_PAGES, CATALOG_CACHE_PRODUCTS
+from app.db.base import SessionLocal
+from app.db import models
+
+# in-process catalog cache; browse handlers read from here instead of the DB.
+# entries are filled lazily (one query per miss) and kept in bounded LRUs.
+# repo write functions call catalog.invalidate() after commit, which bumps the
+# version and drops everything at once. Storing an upload's file_id is not a
+# catalog change and goes through set_image_file_id() instead.
+
+@dataclass(frozen=True, slots=True)
+class CachedCategory:
+    id: int
+    name: str
+
+@dataclass(frozen=True, slots=True)
+class CachedProduct:
+    id: int
+    category_id: int
+    name: str
+    description: str | None
+    price: float
+    image_url: str | None
+    image_file_id: str | None
+    is_active: bool
+
+@dataclass(frozen=True, slots=True)
+class CachedPage:
+    # one keyboard page of a category: (id, name) pairs ordered by (name, id)
+    items: tuple[tuple[int, str], ...]
+    has_prev: bool
+    has_next: bool
+
+class _LRU(OrderedDict):
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def get(self, key, default=None):
+        if key in self:
+            self.move_to_end(key)
+            return self[key]
+        return default
+
+    def put(self, key, value):
+        self[key] = value
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+
+class CatalogCache:
+    """
+    Read `version` *before* awaiting a lookup and use it as the render-cache key:
+    the data returned is never older than that version.
+    """
+
+    def __init__(self, page_size: int = CATALOG_PAGE_SIZE):
+        self.version = 0
+        self.page_size = page_size
+        self._categories: list[CachedCategory] | None = None
+        self._cat_by_id: dict[int, CachedCategory] = {}
+        self._pages = _LRU(CATALOG_CACHE_PAGES)
+        self._products = _LRU(CATALOG_CACHE_PRODUCTS)
+        self._listeners: list = []
+        self._file_id_listeners: list = []
+        self._shared = None  # multiprocessing.Value counting changes across worker processes
+        self._seen = 0
+
+    def subscribe(self, listener):
+        # listener(product, removed_id, reload) runs on every invalidate(); used for incremental
+        # indexes. reload=True: changes are unknown (made by another process), rebuild everything
+        self._listeners.append(listener)
+
+    def subscribe_file_id(self, listener):
+        # listener(product_id, file_id) runs on set_image_file_id()
+        self._file_id_listeners.append(listener)
+
+    def attach_shared(self, counter):
+        # sharded runs: every worker bumps `counter` on its own edits and watches it for the others'
+        self._shared = counter
+        self._seen = counter.value
+
+    def _clear(self, product, removed_id, reload: bool):
+        self.version += 1
+        self._categories = None
+        self._cat_by_id = {}
+        self._pages.clear()
+        self._products.clear()
+        for listener in self._listeners:
+            listener(product, removed_id, reload)
+
+    def invalidate(self, product: models.Product | None = None, removed_id: int | None = None):
+        # called after every catalog mutation; pass the changed/removed product when there is one
+        reload = False
+        if self._shared is not None:
+            with self._shared.get_lock():
+                reload = self._shared.value != self._seen  # missed someone else's edit too
+                self._shared.value += 1
+                self._seen = self._shared.value
+        self._clear(product, removed_id, reload)
+
+    def set_image_file_id(self, product_id: int, file_id: str):
+        # a cached upload is not a catalog change: patch entries in place, version stays.
+        # other workers keep sending by URL until they store their own (or reload from the DB)
+        cp = self._products.get(product_id)
+        if cp is not None:
+            self._products[product_id] = replace(cp, image_file_id=file_id)
+        for listener in self._file_id_listeners:
+            listener(product_id, file_id)
+
+    def sync(self):
+        # drop everything if another worker changed the catalog; called before each update
+        if self._shared is not None and self._shared.value != self._seen:
+            self._seen = self._shared.value
+            self._clear(None, None, True)
+
+    async def _load_categories(self) -> tuple[list[CachedCategory], dict[int, CachedCategory]]:
+        version = self.version
+        async with SessionLocal() as db:
+            rows = (await db.execute(
+                select(models.Category.id, models.Category.name).order_by(models.Category.name)
+            )).all()
+        cats = [CachedCategory(r.id, r.name) for r in rows]
+        by_id = {c.id: c for c in cats}
+        if version == self.version:
+            # both filled together; an admin edit landing mid-load means serve it but don't keep it
+            self._categories, self._cat_by_id = cats, by_id
+        return cats, by_id
+
+    async def categories(self) -> list[CachedCategory]:
+        if self._categories is None:
+            return (await self._load_categories())[0]
+        return self._categories
+
+    async def category(self, category_id: int) -> CachedCategory | None:
+        if self._categories is None:
+            return (await self._load_categories())[1].get(category_id)
+        return self._cat_by_id.get(category_id)
+
+    async def products_page(self, category_id: int, cursor_id: int | None = None,
+                            backwards: bool = False) -> CachedPage:
+        # keyset page (see repo.list_products_page); one indexed range query per miss
+        from app.db import repo
+
+        key = (category_id, cursor_id, backwards)
+        page = self._pages.get(key)
+        if page is not None:
+            return page
+        version = self.version
+        async with SessionLocal() as db:
+            rows, has_more = await repo.list_products_page(
+                db, category_id, cursor_id, backwards, limit=self.page_size
+            )
+        items = tuple((r.id, r.name) for r in rows)
+        if backwards:
+            page = CachedPage(items, has_prev=has_more, has_next=True)
+        else:
+            page = CachedPage(items, has_prev=cursor_id is not None, has_next=has_more)
+        if version == self.version:
+            self._pages.put(key, page)
+        return page
+
+    async def product(self, product_id: int) -> CachedProduct | None:
+        cp = self._products.get(product_id)
+        if cp is not None:
+            return cp
+        version = self.version
+        async with SessionLocal() as db:
+            p = await db.get(models.Product, product_id)
+        if not p:
+            return None
+        cp = CachedProduct(
+            id=p.id,
+            category_id=p.category_id,
+            name=p.name,
+            description=p.description,
+            price=float(p.price),
+            image_url=p.image_url,
+            image_file_id=p.image_file_id,
+            is_active=bool(p.is_active),
+        )
+        if version == self.version:
+            self._products.put(product_id, cp)
+        return cp
+
+catalog = CatalogCache()
@@ -0,0 +1,89 @@
+import asyncio
+import csv
+import gzip
+import os
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import select, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import EXPORT_CHUNK_SIZE
+from app.db import models
+
+HEADER = ["order_number", "created_at", "status", "user_tg_id", "user_name", "item_name", "qty", "price", "line_total", "order_total"]
+
+def orders_export_stmt(since: datetime, until: datetime | None = None, status: str | None = None):
+    # one query: orders + users + items + product names (orders without items still show up)
+    stmt = (
+        select(
+            models.Order.order_number,
+            models.Order.created_at,
+            models.Order.status,
+            models.User.tg_id,
+            models.User.name.label("user_name"),
+            models.Product.name.label("item_name"),
+            models.OrderItem.qty,
+            models.OrderItem.price,
+            models.Order.total,
+        )
+        .outerjoin(models.User, models.User.id == models.Order.user_id)
+        .outerjoin(models.OrderItem, models.OrderItem.order_id == models.Order.id)
+        .outerjoin(models.Product, models.Product.id == models.OrderItem.product_id)
+        .where(models.Order.created_at >= since)
+        .order_by(desc(models.Order.created_at), models.Order.id, models.OrderItem.id)
+    )
+    if until is not None:
+        stmt = stmt.where(models.Order.created_at < until)
+    if status and status != "all":
+        stmt = stmt.where(models.Order.status == status)
+    return stmt
+
+def _csv_row(r) -> list:
+    if r.qty is None:
+        return [r.order_number, r.created_at, r.status, r.tg_id or "", r.user_name or "", "", "", "", "", float(r.total)]
+    price = float(r.price)
+    return [r.order_number, r.created_at, r.status, r.tg_id or "", r.user_name or "",
+            r.item_name, r.qty, price, r.qty * price, float(r.total)]
+
+def _open(path: str, compress: bool):
+    # BOM so Excel detects UTF-8
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8-sig", newline="")
+    return open(path, "w", encoding="utf-8-sig", newline="")
+
+def _write_rows(writer, rows):
+    writer.writerows(_csv_row(r) for r in rows)
+
+async def export_orders_csv(
+    db: AsyncSession,
+    since: datetime,
+    until: datetime | None = None,
+    status: str | None = None,
+    compress: bool = False,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> tuple[str, int]:
+    """
+    Stream matching order lines into a temp CSV (optionally gzipped).
+    Rows are fetched in chunks; formatting and file I/O run in a worker thread
+    so the event loop keeps serving other updates. Caller removes the file.
+    """
+    fd, path = tempfile.mkstemp(prefix="orders_", suffix=".csv.gz" if compress else ".csv")
+    os.close(fd)
+    count = 0
+    f = await asyncio.to_thread(_open, path, compress)
+    try:
+        writer = csv.writer(f)
+        await asyncio.to_thread(writer.writerow, HEADER)
+        result = await db.stream(
+            orders_export_stmt(since, until, status).execution_options(yield_per=chunk_size)
+        )
+        async for rows in result.partitions(chunk_size):
+            await asyncio.to_thread(_write_rows, writer, rows)
+            count += len(rows)
+    except BaseException:
+        await asyncio.to_thread(f.close)
+        os.remove(path)
+        raise
+    await asyncio.to_thread(f.close)
+    return path, count
@@ -0,0 +1,139 @@
+"""
+Versioned schema migrations for existing SQLite databases.
+
+`create_all` only creates missing tables, so anything added to an existing
+table (indexes, constraints, data fixes) goes here. The applied version is
+kept in `PRAGMA user_version`; every step is idempotent, so a fresh database
+built by `create_all` can run them all harmlessly.
+
+    python -m app.db.migrations            # create tables + apply migrations
+    python -m app.db.migrations --explain  # also check hot queries use indexes
+"""
+import asyncio
+import logging
+import sys
+
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+log = logging.getLogger("ecombot.migrations")
+
+# (version, description, SQL steps) — append only, never edit an applied entry
+MIGRATIONS: list[tuple[int, str, list[str]]] = [
+    (1, "hot-path indexes + unique cart line per product", [
+        "CREATE INDEX IF NOT EXISTS ix_orders_status_created_at ON orders (status, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_orders_created_at ON orders (created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_order_items_order_id ON order_items (order_id)",
+        "CREATE INDEX IF NOT EXISTS ix_products_category_active_name ON products (category_id, is_active, name)",
+        # merge duplicate cart lines before the unique index can be built
+        """UPDATE cart_items SET qty = (
+               SELECT SUM(c2.qty) FROM cart_items c2
+               WHERE c2.user_id = cart_items.user_id AND c2.product_id = cart_items.product_id)
+           WHERE id IN (SELECT MIN(id) FROM cart_items GROUP BY user_id, product_id HAVING COUNT(*) > 1)""",
+        "DELETE FROM cart_items WHERE id NOT IN (SELECT MIN(id) FROM cart_items GROUP BY user_id, product_id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_cart_items_user_product ON cart_items (user_id, product_id)",
+        # covered by the unique index prefix
+        "DROP INDEX IF EXISTS ix_cart_items_user_id",
+    ]),
+    (2, "FTS5 product search index kept in sync by triggers", [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+               name, description,
+               content='products', content_rowid='id',
+               tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+        """CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+               INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+               INSERT INTO products_fts(products_fts, rowid, name, description)
+               VALUES ('delete', old.id, old.name, old.description);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, description ON products BEGIN
+               INSERT INTO products_fts(products_fts, rowid, name, description)
+               VALUES ('delete', old.id, old.name, old.description);
+               INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+           END""",
+        # index whatever is already in the table
+        "INSERT INTO products_fts(products_fts) VALUES ('rebuild')",
+    ]),
+]
+
+async def migrate(conn: AsyncConnection) -> int:
+    """Apply pending migrations on `conn`; returns the resulting schema version."""
+    current = (await conn.exec_driver_sql("PRAGMA user_version")).scalar()
+    for version, description, steps in MIGRATIONS:
+        if version <= current:
+            continue
+        log.info("Applying migration %s: %s", version, description)
+        for sql in steps:
+            await conn.exec_driver_sql(sql)
+        await conn.exec_driver_sql(f"PRAGMA user_version={version}")
+        current = version
+    return current
+
+def hot_queries() -> dict[str, str]:
+    """The hot read statements of repo.py, compiled for SQLite with literal sample params."""
+    from datetime import datetime
+    from sqlalchemy.dialects import sqlite
+    from app.db import repo
+
+    stmts = {
+        "list_products_by_category": repo.products_by_category_stmt(1),
+        "list_products_page": repo.products_page_stmt(1, None, False, 20),
+        "list_products_page (cursor)": repo.products_page_stmt(1, 1, False, 20),
+        "list_products_page (back)": repo.products_page_stmt(1, 1, True, 20),
+        "list_products_admin_page": repo.admin_products_page_stmt(1, False, 20),
+        "get_cart_view": repo.cart_view_stmt(1),
+        "create_order snapshot": repo.cart_snapshot_stmt(1),
+        "list_orders_by_status": repo.orders_by_status_stmt("new", 30),
+        "list_orders_by_status (all)": repo.orders_by_status_stmt("all", 30),
+        "list_orders_page": repo.orders_page_stmt("new", 1, False, 20),
+        "list_orders_page (all)": repo.orders_page_stmt("all", 1, False, 20),
+        "count_orders": repo.count_orders_stmt("new", 1),
+        "list_orders_last_days": repo.orders_since_stmt(datetime(2000, 1, 1)),
+        "get_order_with_items": repo.order_items_stmt(1),
+        "get_or_create_user_id": repo.user_id_stmt(1),
+    }
+    dialect = sqlite.dialect()
+    return {
+        name: str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+        for name, stmt in stmts.items()
+    }
+
+async def explain_hot_queries(conn: AsyncConnection) -> dict[str, list[str]]:
+    plans = {}
+    for name, sql in hot_queries().items():
+        rows = (await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")).all()
+        plans[name] = [r[-1] for r in rows]
+    return plans
+
+def full_scans(plans: dict[str, list[str]]) -> dict[str, list[str]]:
+    # "SCAN orders USING INDEX ..." is an ordered index walk; plain "SCAN orders" is a table scan.
+    # "SCAN (subquery-N)" walks an already-filtered intermediate result (window functions)
+    bad = {}
+    for name, lines in plans.items():
+        scans = [ln for ln in lines if ln.startswith("SCAN ") and "USING" not in ln and not ln.startswith("SCAN (")]
+        if scans:
+            bad[name] = scans
+    return bad
+
+async def _main(explain: bool) -> int:
+    from app.db.base import engine, init_db
+
+    await init_db()
+    rc = 0
+    if explain:
+        async with engine.connect() as conn:
+            plans = await explain_hot_queries(conn)
+        for name, lines in plans.items():
+            print(f"{name}:")
+            for ln in lines:
+                print(f"    {ln}")
+        bad = full_scans(plans)
+        if bad:
+            print(f"FULL SCANS: {', '.join(bad)}")
+            rc = 1
+    await engine.dispose()
+    return rc
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+    sys.exit(asyncio.run(_main("--explain" in sys.argv[1:])))
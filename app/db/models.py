@@ -1,4 +1,5 @@
-from sqlalchemy import String, Integer, ForeignKey, Text, Numeric, DateTime, func
+from datetime import datetime
+from sqlalchemy import String, Integer, ForeignKey, Text, Numeric, DateTime, Index, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.base import Base
 
@@ -12,6 +13,10 @@ class Category(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # category browsing: active products of a category ordered by name
+        Index("ix_products_category_active_name", "category_id", "is_active", "name"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     category_id: Mapped[int] = mapped_column(ForeignKey("categories.id", ondelete="CASCADE"))
     name: Mapped[str] = mapped_column(String(150), index=True)
@@ -33,13 +38,21 @@ class User(Base):
 
 class CartItem(Base):
     __tablename__ = "cart_items"
+    __table_args__ = (
+        # one line per product per user; also serves lookups by user_id
+        Index("uq_cart_items_user_product", "user_id", "product_id", unique=True),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
     product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"))
     qty: Mapped[int] = mapped_column(Integer, default=1)
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_status_created_at", "status", "created_at"),
+        Index("ix_orders_created_at", "created_at"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     order_number: Mapped[str] = mapped_column(String(32), unique=True, index=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
@@ -50,7 +63,31 @@ class Order(Base):
 class OrderItem(Base):
     __tablename__ = "order_items"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id", ondelete="CASCADE"))
+    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id", ondelete="CASCADE"), index=True)
     product_id: Mapped[int] = mapped_column(ForeignKey("products.id"))
     qty: Mapped[int] = mapped_column(Integer)
-    price: Mapped[float] = mapped_column(Numeric(10, 2))
\ No newline at end of file
+    price: Mapped[float] = mapped_column(Numeric(10, 2))
+
+class OutboxMessage(Base):
+    __tablename__ = "outbox"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    chat_id: Mapped[int] = mapped_column(Integer)
+    text: Mapped[str] = mapped_column(Text)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)  # also the claim lease
+    created_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+class MediaAsset(Base):
+    # Telegram file_id of a static image (e.g. the shop banner), keyed by name
+    __tablename__ = "media_assets"
+    key: Mapped[str] = mapped_column(String(50), primary_key=True)
+    source_url: Mapped[str] = mapped_column(Text)   # file_id is only reused while the URL is unchanged
+    file_id: Mapped[str] = mapped_column(String(255))
+
+class FsmRecord(Base):
+    # aiogram FSM state/data per storage key (see app/bot/storage.py)
+    __tablename__ = "fsm_states"
+    key: Mapped[str] = mapped_column(String(200), primary_key=True)
+    state: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    data: Mapped[str] = mapped_column(Text, default="{}")  # JSON
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
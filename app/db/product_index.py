@@ -0,0 +1,139 @@
+import asyncio
+import heapq
+from bisect import bisect_left
+from dataclasses import dataclass, replace
+import re
+
+from sqlalchemy import select
+
+from app.db.base import SessionLocal
+from app.db.cache import catalog
+from app.db import models
+
+# in-memory word-prefix index over active product names, for inline queries that
+# fire on every keystroke. Built from the DB once, then kept current through
+# catalog.invalidate(product=..., removed_id=...) from the repo write functions.
+
+_WORD = re.compile(r"\w+")
+
+def _words(text: str) -> list[str]:
+    return _WORD.findall(text.lower())
+
+@dataclass(frozen=True, slots=True)
+class IndexedProduct:
+    id: int
+    name: str
+    description: str | None
+    price: float
+    image_url: str | None
+    image_file_id: str | None
+
+class ProductNameIndex:
+    def __init__(self):
+        self._products: dict[int, IndexedProduct] = {}
+        self._postings: dict[str, set[int]] = {}   # word -> product ids
+        self._vocab: list[str] = []                # sorted words, for prefix ranges
+        self._built = False
+        self._built_version = -1
+        self._lock = asyncio.Lock()
+        catalog.subscribe(self._on_catalog_change)
+        catalog.subscribe_file_id(self._on_file_id)
+
+    # ---------- maintenance ----------
+    def _add(self, p: IndexedProduct):
+        self._products[p.id] = p
+        for w in set(_words(p.name)):
+            ids = self._postings.get(w)
+            if ids is None:
+                ids = self._postings[w] = set()
+                self._vocab.insert(bisect_left(self._vocab, w), w)
+            ids.add(p.id)
+
+    def _remove(self, product_id: int):
+        p = self._products.pop(product_id, None)
+        if p is None:
+            return
+        for w in set(_words(p.name)):
+            ids = self._postings.get(w)
+            if ids is None:
+                continue
+            ids.discard(product_id)
+            if not ids:
+                del self._postings[w]
+                self._vocab.pop(bisect_left(self._vocab, w))
+
+    def _on_catalog_change(self, product: models.Product | None, removed_id: int | None, reload: bool):
+        if not self._built:
+            return
+        if reload:
+            self._built = False  # next lookup loads from the DB again
+            return
+        if removed_id is not None:
+            self._remove(removed_id)
+        if product is not None:
+            self._remove(product.id)
+            if product.is_active:
+                self._add(_indexed(product))
+        self._built_version = catalog.version
+
+    def _on_file_id(self, product_id: int, file_id: str):
+        # name unchanged, so the postings stay as they are
+        p = self._products.get(product_id)
+        if p is not None:
+            self._products[product_id] = replace(p, image_file_id=file_id)
+
+    async def ensure_built(self):
+        if self._built:
+            return
+        async with self._lock:
+            while not self._built:
+                version = catalog.version
+                async with SessionLocal() as db:
+                    rows = (await db.execute(
+                        select(models.Product).where(models.Product.is_active == True)
+                    )).scalars().all()
+                if version != catalog.version:
+                    continue  # catalog changed mid-load; load again
+                self._products, self._postings, self._vocab = {}, {}, []
+                for p in rows:
+                    self._add(_indexed(p))
+                self._built, self._built_version = True, version
+
+    # ---------- lookup ----------
+    def _prefix_ids(self, prefix: str) -> set[int]:
+        ids: set[int] = set()
+        i = bisect_left(self._vocab, prefix)
+        while i < len(self._vocab) and self._vocab[i].startswith(prefix):
+            ids |= self._postings[self._vocab[i]]
+            i += 1
+        return ids
+
+    def search(self, query: str, limit: int, offset: int = 0) -> tuple[list[IndexedProduct], bool]:
+        """Every query word must prefix-match a name word; names starting with the query rank first."""
+        words = _words(query)
+        if words:
+            ids = None
+            for w in sorted(words, key=len, reverse=True):  # longest prefix = smallest set first
+                ids = self._prefix_ids(w) if ids is None else ids & self._prefix_ids(w)
+                if not ids:
+                    return [], False
+            found = [self._products[i] for i in ids]
+        else:
+            found = self._products.values()
+        q = " ".join(words)
+        # only the top offset+limit are ordered; short prefixes can match most of the catalog
+        top = heapq.nsmallest(offset + limit, found,
+                              key=lambda p: (not p.name.lower().startswith(q), p.name.lower(), p.id))
+        return top[offset:], offset + limit < len(found)
+
+def _indexed(p: models.Product) -> IndexedProduct:
+    return IndexedProduct(
+        id=p.id,
+        name=p.name,
+        description=p.description,
+        price=float(p.price),
+        image_url=p.image_url,
+        image_file_id=p.image_file_id,
+    )
+
+product_index = ProductNameIndex()
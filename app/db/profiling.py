@@ -0,0 +1,95 @@
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from app.core.config import QUERY_BUDGET_DEFAULT, QUERY_REPEAT_LIMIT
+
+log = logging.getLogger("ecombot.queries")
+
+# Statement accounting per unit of work (one update, or a block in a test).
+# A cursor hook on the engine adds every statement to the scope in the current
+# contextvar; when the scope closes it is checked against its budget and for
+# repeated statement shapes (the N+1 signature: same SQL, different parameters).
+
+_IN_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+
+def statement_shape(statement: str) -> str:
+    # expanded IN (?, ?, ?) lists would make every call look different
+    return _IN_LIST.sub("(?...)", " ".join(statement.split()))
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+class QueryScope:
+    __slots__ = ("name", "budget", "repeat_limit", "count", "shapes", "closed", "parent")
+
+    def __init__(self, name: str, budget: int | None = QUERY_BUDGET_DEFAULT,
+                 repeat_limit: int | None = QUERY_REPEAT_LIMIT, parent: "QueryScope | None" = None):
+        self.name = name
+        self.parent = parent  # enclosing scope (e.g. a test around a whole update) counts too
+        self.budget = budget
+        self.repeat_limit = repeat_limit
+        self.count = 0
+        self.shapes: Counter[str] = Counter()
+        self.closed = False
+
+    def record(self, statement: str, shape: str | None = None):
+        if not self.closed:
+            shape = shape or statement_shape(statement)
+            self.count += 1
+            self.shapes[shape] += 1
+        if self.parent is not None:
+            self.parent.record(statement, shape)
+
+    def repeated(self) -> list[tuple[str, int]]:
+        if self.repeat_limit is None:
+            return []
+        return [(s, n) for s, n in self.shapes.most_common() if n > self.repeat_limit]
+
+    def problems(self) -> list[str]:
+        out = []
+        if self.budget is not None and self.count > self.budget:
+            out.append(f"{self.count} queries (budget {self.budget})")
+        out += [f"{n}x {s[:200]}" for s, n in self.repeated()]
+        return out
+
+_current: ContextVar[QueryScope | None] = ContextVar("query_scope", default=None)
+
+def current_scope() -> QueryScope | None:
+    return _current.get()
+
+@contextmanager
+def track_queries(name: str, budget: int | None = QUERY_BUDGET_DEFAULT,
+                  repeat_limit: int | None = QUERY_REPEAT_LIMIT, mode: str = "raise"):
+    """
+    Count statements run inside the block (including awaited calls).
+    mode "raise": QueryBudgetExceeded on exit if over budget or N+1-like repeats;
+    "log": warning instead; "off": count only.
+    """
+    scope = QueryScope(name, budget, repeat_limit, parent=_current.get())
+    token = _current.set(scope)
+    try:
+        yield scope
+    finally:
+        _current.reset(token)
+        scope.closed = True  # tasks spawned inside keep the contextvar; stop counting them
+    problems = scope.problems() if mode != "off" else []
+    if problems:
+        msg = f"{scope.name}: " + "; ".join(problems)
+        if mode == "raise":
+            raise QueryBudgetExceeded(msg)
+        log.warning("Query budget: %s", msg)
+
+def install(engine):
+    """Feed every statement on `engine` into the active scope, if any."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        scope = _current.get()
+        if scope is not None:
+            scope.record(statement)
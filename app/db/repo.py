@@ -1,8 +1,11 @@
 from datetime import datetime, timedelta
+import re
 import secrets
-from sqlalchemy import select, delete, desc
+from sqlalchemy import select, insert, update, delete, desc, func, tuple_, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import models
+from app.db.cache import catalog
 
 # order number like L-YYMMDD-XXXX
 def _gen_order_number() -> str:
@@ -18,6 +21,7 @@ async def create_category(db: AsyncSession, name: str):
     c = models.Category(name=name)
     db.add(c)
     await db.commit()
+    catalog.invalidate()
     await db.refresh(c)
     return c
 
@@ -26,14 +30,113 @@ async def list_products(db: AsyncSession, limit: int = 50):
     res = await db.execute(select(models.Product).order_by(models.Product.id.desc()).limit(limit))
     return res.scalars().all()
 
-async def list_products_by_category(db: AsyncSession, category_id: int):
-    res = await db.execute(
+# *_stmt builders hold the statements of the hot read paths, so that
+# app.db.migrations --explain checks the plans of exactly what runs here
+
+def admin_products_page_stmt(cursor_id: int | None, backwards: bool, limit: int):
+    P = models.Product
+    stmt = select(P)
+    if cursor_id is not None:
+        stmt = stmt.where(P.id > cursor_id if backwards else P.id < cursor_id)
+    return stmt.order_by(P.id if backwards else P.id.desc()).limit(limit + 1)
+
+async def list_products_admin_page(
+    db: AsyncSession,
+    cursor_id: int | None = None,
+    backwards: bool = False,
+    limit: int = 20,
+):
+    # newest first, keyset on id; same (rows, has_more) contract as list_products_page
+    stmt = admin_products_page_stmt(cursor_id, backwards, limit)
+    rows = list((await db.execute(stmt)).scalars().all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+    return rows, has_more
+
+async def count_products(db: AsyncSession, newer_than_id: int | None = None) -> int:
+    # all products, or those listed before `newer_than_id` (= its offset in the admin list)
+    stmt = select(func.count()).select_from(models.Product)
+    if newer_than_id is not None:
+        stmt = stmt.where(models.Product.id > newer_than_id)
+    return (await db.execute(stmt)).scalar_one()
+
+def products_by_category_stmt(category_id: int):
+    return (
         select(models.Product)
         .where(models.Product.category_id == category_id, models.Product.is_active == True)
         .order_by(models.Product.name)
     )
+
+async def list_products_by_category(db: AsyncSession, category_id: int):
+    res = await db.execute(products_by_category_stmt(category_id))
     return res.scalars().all()
 
+def products_page_stmt(category_id: int, cursor_id: int | None, backwards: bool, limit: int):
+    P = models.Product
+    stmt = select(P.id, P.name).where(P.category_id == category_id, P.is_active == True)
+    if cursor_id is not None:
+        cursor = tuple_(select(P.name).where(P.id == cursor_id).scalar_subquery(), cursor_id)
+        key = tuple_(P.name, P.id)
+        stmt = stmt.where(key < cursor if backwards else key > cursor)
+    if backwards:
+        stmt = stmt.order_by(P.name.desc(), P.id.desc())
+    else:
+        stmt = stmt.order_by(P.name, P.id)
+    return stmt.limit(limit + 1)
+
+async def list_products_page(
+    db: AsyncSession,
+    category_id: int,
+    cursor_id: int | None = None,
+    backwards: bool = False,
+    limit: int = 20,
+):
+    """
+    One page of active products of a category as (id, name) rows, keyset-paginated on (name, id).
+    cursor_id: product id to continue after (or before, when backwards); None = first page.
+    Returns (rows, has_more) where has_more means another page exists in that direction.
+    """
+    res = await db.execute(products_page_stmt(category_id, cursor_id, backwards, limit))
+    rows = res.all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+    return rows, has_more
+
+def _fts_query(raw: str) -> str:
+    # user text -> safe FTS5 query: every word must match, as a prefix ("wat cla" finds "Classic Watch")
+    words = re.findall(r"\w+", raw.lower())
+    return " ".join(f'"{w}"*' for w in words[:8])
+
+async def search_products(db: AsyncSession, query: str, limit: int = 10, offset: int = 0):
+    """
+    Active products matching `query` via the products_fts index, best bm25 rank first
+    (name hits weigh more than description hits). Returns (rows, has_more).
+    """
+    match = _fts_query(query)
+    if not match:
+        return [], False
+    res = await db.execute(
+        text(
+            "SELECT p.id, p.name, p.price, p.category_id "
+            "FROM products_fts JOIN products p ON p.id = products_fts.rowid "
+            "WHERE products_fts MATCH :match AND p.is_active = 1 "
+            "ORDER BY bm25(products_fts, 10.0, 1.0), p.id "
+            "LIMIT :limit OFFSET :offset"
+        ),
+        {"match": match, "limit": limit + 1, "offset": offset},
+    )
+    rows = res.all()
+    return rows[:limit], len(rows) > limit
+
+async def rebuild_search_index(db: AsyncSession):
+    # re-index from the products table (triggers keep it in sync; this repairs drift)
+    await db.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+    await db.commit()
+
 async def list_products_without_photo(db: AsyncSession):
     res = await db.execute(
         select(models.Product).where(
@@ -62,6 +165,7 @@ async def create_product(
     )
     db.add(p)
     await db.commit()
+    catalog.invalidate(product=p)
     await db.refresh(p)
     return p
 
@@ -69,15 +173,20 @@ async def update_product_fields(db: AsyncSession, product_id: int, **fields):
     p = await db.get(models.Product, product_id)
     if not p:
         return None
+    if "image_url" in fields and fields["image_url"] != p.image_url:
+        # new picture; the stored file_id shows the old one
+        fields.setdefault("image_file_id", None)
     for k, v in fields.items():
         setattr(p, k, v)
     await db.commit()
+    catalog.invalidate(product=p)
     await db.refresh(p)
     return p
 
 async def delete_product(db: AsyncSession, product_id: int):
     await db.execute(delete(models.Product).where(models.Product.id == product_id))
     await db.commit()
+    catalog.invalidate(removed_id=product_id)
 
 async def set_product_photo_file_id(db: AsyncSession, product_id: int, file_id: str):
     p = await db.get(models.Product, product_id)
@@ -85,8 +194,30 @@ async def set_product_photo_file_id(db: AsyncSession, product_id: int, file_id:
         return None
     p.image_file_id = file_id
     await db.commit()
+    catalog.invalidate(product=p)
     return p
 
+async def store_product_file_id(db: AsyncSession, product_id: int, file_id: str):
+    # file_id Telegram returned for the product's URL image; an admin-set photo wins
+    await db.execute(
+        update(models.Product)
+        .where(models.Product.id == product_id, models.Product.image_file_id.is_(None))
+        .values(image_file_id=file_id)
+    )
+    await db.commit()
+    catalog.set_image_file_id(product_id, file_id)
+
+async def list_products_to_warm(db: AsyncSession):
+    # active products that still send their image by URL
+    res = await db.execute(
+        select(models.Product.id, models.Product.image_url).where(
+            models.Product.is_active == True,
+            models.Product.image_file_id.is_(None),
+            models.Product.image_url.is_not(None),
+        ).order_by(models.Product.id)
+    )
+    return res.all()
+
 # ---------- users ----------
 async def get_or_create_user(db: AsyncSession, tg_id: int):
     res = await db.execute(select(models.User).where(models.User.tg_id == tg_id))
@@ -98,42 +229,102 @@ async def get_or_create_user(db: AsyncSession, tg_id: int):
         await db.refresh(user)
     return user
 
+def user_id_stmt(tg_id: int):
+    return select(models.User.id).where(models.User.tg_id == tg_id)
+
+async def get_or_create_user_id(db: AsyncSession, tg_id: int) -> int:
+    # common case: one indexed SELECT; new users: insert-if-missing (race safe on tg_id)
+    res = await db.execute(user_id_stmt(tg_id))
+    user_id = res.scalar_one_or_none()
+    if user_id is not None:
+        return user_id
+    res = await db.execute(
+        sqlite_insert(models.User)
+        .values(tg_id=tg_id)
+        .on_conflict_do_nothing(index_elements=[models.User.tg_id])
+        .returning(models.User.id)
+    )
+    user_id = res.scalar_one_or_none()
+    await db.commit()
+    if user_id is None:
+        # another update inserted the same user first
+        res = await db.execute(user_id_stmt(tg_id))
+        user_id = res.scalar_one()
+    return user_id
+
 async def update_user_details(db: AsyncSession, tg_id: int, name: str, phone: str, address: str):
     user = await get_or_create_user(db, tg_id)
     user.name, user.phone, user.address = name, phone, address
     await db.commit()
     return user
 
+async def update_user_details_by_id(db: AsyncSession, user_id: int, name: str, phone: str, address: str):
+    # one UPDATE by internal users.id (already resolved by DbSessionMiddleware)
+    await db.execute(
+        update(models.User)
+        .where(models.User.id == user_id)
+        .values(name=name, phone=phone, address=address)
+    )
+    await db.commit()
+
 # ---------- cart ----------
 async def add_to_cart(db: AsyncSession, user_id: int, product_id: int, qty: int = 1):
-    res = await db.execute(
-        select(models.CartItem).where(
-            models.CartItem.user_id == user_id, models.CartItem.product_id == product_id
-        )
-    )
-    item = res.scalar_one_or_none()
-    if item:
-        item.qty += qty
-    else:
-        item = models.CartItem(user_id=user_id, product_id=product_id, qty=qty)
-        db.add(item)
+    # single atomic upsert on uq_cart_items_user_product; concurrent taps add up instead of racing
+    stmt = sqlite_insert(models.CartItem).values(user_id=user_id, product_id=product_id, qty=qty)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.CartItem.user_id, models.CartItem.product_id],
+        set_={"qty": models.CartItem.qty + stmt.excluded.qty},
+    ).returning(models.CartItem)
+    res = await db.execute(stmt, execution_options={"populate_existing": True})
+    item = res.scalar_one()
     await db.commit()
     return item
 
 async def get_cart(db: AsyncSession, user_id: int):
-    res = await db.execute(select(models.CartItem).where(models.CartItem.user_id == user_id))
-    items = res.scalars().all()
-    total = 0.0
-    for it in items:
-        p = await db.get(models.Product, it.product_id)
-        total += float(p.price) * it.qty
+    res = await db.execute(
+        select(models.CartItem, func.sum(models.Product.price * models.CartItem.qty).over())
+        .join(models.Product, models.Product.id == models.CartItem.product_id)
+        .where(models.CartItem.user_id == user_id)
+        .order_by(models.CartItem.id)
+    )
+    rows = res.all()
+    items = [it for (it, _) in rows]
+    total = float(rows[0][1]) if rows else 0.0
     return items, round(total, 2)
 
+def cart_view_stmt(user_id: int):
+    line_total = (models.Product.price * models.CartItem.qty).label("line_total")
+    return (
+        select(
+            models.CartItem.id,
+            models.Product.name,
+            models.Product.price,
+            models.CartItem.qty,
+            line_total,
+            func.sum(line_total).over().label("total"),
+        )
+        .join(models.Product, models.Product.id == models.CartItem.product_id)
+        .where(models.CartItem.user_id == user_id)
+        .order_by(models.CartItem.id)
+    )
+
+async def get_cart_view(db: AsyncSession, user_id: int):
+    # one joined query: lines with product name/price + cart total (window sum)
+    res = await db.execute(cart_view_stmt(user_id))
+    lines = res.all()
+    total = float(lines[0].total) if lines else 0.0
+    return lines, round(total, 2)
+
 async def change_qty(db: AsyncSession, item_id: int, delta: int):
-    item = await db.get(models.CartItem, item_id)
-    if not item:
-        return None
-    item.qty = max(1, item.qty + delta)
+    # qty = max(1, qty + delta) computed in SQL, new row returned in the same statement
+    res = await db.execute(
+        update(models.CartItem)
+        .where(models.CartItem.id == item_id)
+        .values(qty=func.max(1, models.CartItem.qty + delta))
+        .returning(models.CartItem),
+        execution_options={"populate_existing": True},
+    )
+    item = res.scalar_one_or_none()
     await db.commit()
     return item
 
@@ -146,59 +337,212 @@ async def clear_cart(db: AsyncSession, user_id: int):
     await db.commit()
 
 # ---------- orders ----------
-async def create_order(db: AsyncSession, user_id: int):
-    items, total = await get_cart(db, user_id)
-    if not items:
+def cart_snapshot_stmt(user_id: int):
+    return (
+        select(models.CartItem.id, models.CartItem.product_id, models.CartItem.qty, models.Product.price)
+        .join(models.Product, models.Product.id == models.CartItem.product_id)
+        .where(models.CartItem.user_id == user_id)
+        .order_by(models.CartItem.id)
+    )
+
+async def create_order(db: AsyncSession, user_id: int, notify=None):
+    # one transaction: snapshot cart with prices, insert order + items, empty cart, commit once.
+    # notify(order) -> [(chat_id, text)] is queued in the outbox inside the same transaction
+    res = await db.execute(cart_snapshot_stmt(user_id))
+    snapshot = res.all()
+    if not snapshot:
         return None
-    order = models.Order(user_id=user_id, total=total, status="new", order_number=_gen_order_number())
-    db.add(order)
-    await db.commit()
-    await db.refresh(order)
-    for it in items:
-        p = await db.get(models.Product, it.product_id)
-        db.add(models.OrderItem(order_id=order.id, product_id=p.id, qty=it.qty, price=p.price))
-    await db.commit()
-    await clear_cart(db, user_id)
+    total = round(sum(float(price) * qty for (_, _, qty, price) in snapshot), 2)
+    try:
+        order = models.Order(user_id=user_id, total=total, status="new", order_number=_gen_order_number())
+        db.add(order)
+        await db.flush()  # order.id for the items
+        await db.execute(
+            insert(models.OrderItem),
+            [
+                {"order_id": order.id, "product_id": pid, "qty": qty, "price": price}
+                for (_, pid, qty, price) in snapshot
+            ],
+        )
+        # only the rows that were ordered; an item added by a concurrent update stays in the cart
+        await db.execute(delete(models.CartItem).where(models.CartItem.id.in_([r.id for r in snapshot])))
+        if notify is not None:
+            await _insert_outbox(db, notify(order))
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
     return order
 
 async def list_orders(db: AsyncSession, limit: int = 20):
     res = await db.execute(select(models.Order).order_by(desc(models.Order.created_at)).limit(limit))
     return res.scalars().all()
 
-async def list_orders_by_status(db: AsyncSession, status: str | None, limit: int = 30):
+def orders_by_status_stmt(status: str | None, limit: int):
     stmt = select(models.Order).order_by(desc(models.Order.created_at)).limit(limit)
     if status and status != "all":
         stmt = stmt.where(models.Order.status == status)
-    res = await db.execute(stmt)
+    return stmt
+
+async def list_orders_by_status(db: AsyncSession, status: str | None, limit: int = 30):
+    res = await db.execute(orders_by_status_stmt(status, limit))
     return res.scalars().all()
 
+def _order_key_cursor(cursor_id: int):
+    # (created_at, id) of the cursor order, resolved inside the same statement
+    return tuple_(
+        select(models.Order.created_at).where(models.Order.id == cursor_id).scalar_subquery(),
+        cursor_id,
+    )
+
+def orders_page_stmt(status: str | None, cursor_id: int | None, backwards: bool, limit: int):
+    O = models.Order
+    stmt = select(O)
+    if status and status != "all":
+        stmt = stmt.where(O.status == status)
+    if cursor_id is not None:
+        key = tuple_(O.created_at, O.id)
+        cursor = _order_key_cursor(cursor_id)
+        stmt = stmt.where(key > cursor if backwards else key < cursor)
+    if backwards:
+        stmt = stmt.order_by(O.created_at, O.id)
+    else:
+        stmt = stmt.order_by(desc(O.created_at), desc(O.id))
+    return stmt.limit(limit + 1)
+
+async def list_orders_page(
+    db: AsyncSession,
+    status: str | None,
+    cursor_id: int | None = None,
+    backwards: bool = False,
+    limit: int = 20,
+):
+    # newest first, keyset on (created_at, id); served by ix_orders_status_created_at / ix_orders_created_at
+    rows = list((await db.execute(orders_page_stmt(status, cursor_id, backwards, limit))).scalars().all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+    return rows, has_more
+
+def count_orders_stmt(status: str | None, newer_than_id: int | None):
+    O = models.Order
+    stmt = select(func.count()).select_from(O)
+    if status and status != "all":
+        stmt = stmt.where(O.status == status)
+    if newer_than_id is not None:
+        stmt = stmt.where(tuple_(O.created_at, O.id) > _order_key_cursor(newer_than_id))
+    return stmt
+
+async def count_orders(db: AsyncSession, status: str | None, newer_than_id: int | None = None) -> int:
+    # matching orders, or those listed before `newer_than_id` (= its offset in the admin list)
+    return (await db.execute(count_orders_stmt(status, newer_than_id))).scalar_one()
+
+def order_items_stmt(order_id: int):
+    return (
+        select(models.OrderItem, models.Product.name)
+        .join(models.Product, models.Product.id == models.OrderItem.product_id)
+        .where(models.OrderItem.order_id == order_id)
+    )
+
 async def get_order_with_items(db: AsyncSession, order_id: int):
     order = await db.get(models.Order, order_id)
     if not order:
         return None, [], None
     # items + product names
-    res = await db.execute(
-        select(models.OrderItem, models.Product.name)
-        .join(models.Product, models.Product.id == models.OrderItem.product_id)
-        .where(models.OrderItem.order_id == order_id)
-    )
+    res = await db.execute(order_items_stmt(order_id))
     rows = res.all()
     items = [{"name": name, "qty": oi.qty, "price": float(oi.price)} for (oi, name) in rows]
     user = await db.get(models.User, order.user_id)
     return order, items, user
 
-async def set_order_status(db: AsyncSession, order_id: int, status: str):
+async def set_order_status(db: AsyncSession, order_id: int, status: str, notify=None):
+    # notify(order, tg_id) -> [(chat_id, text)] is queued in the outbox in the same transaction;
+    # tg_id is the customer's Telegram id (None if the user row is gone)
     order = await db.get(models.Order, order_id)
     if not order:
         return None
-    order.status = status
-    await db.commit()
+    try:
+        order.status = status
+        if notify is not None:
+            tg_id = (await db.execute(
+                select(models.User.tg_id)
+                .join(models.Order, models.Order.user_id == models.User.id)
+                .where(models.Order.id == order_id)
+            )).scalar_one_or_none()
+            await _insert_outbox(db, notify(order, tg_id))
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
     await db.refresh(order)
     return order
 
+def orders_since_stmt(since: datetime):
+    return select(models.Order).where(models.Order.created_at >= since).order_by(desc(models.Order.created_at))
+
 async def list_orders_last_days(db: AsyncSession, days: int = 30):
     since = datetime.utcnow() - timedelta(days=days)
+    res = await db.execute(orders_since_stmt(since))
+    return res.scalars().all()
+
+# ---------- outbox ----------
+async def _insert_outbox(db: AsyncSession, messages: list[tuple[int, str]]):
+    if messages:
+        await db.execute(
+            insert(models.OutboxMessage),
+            [{"chat_id": chat_id, "text": text} for (chat_id, text) in messages],
+        )
+
+async def enqueue_messages(db: AsyncSession, messages: list[tuple[int, str]]):
+    # messages: (chat_id, text); the sender task delivers them later
+    if not messages:
+        return
+    await _insert_outbox(db, messages)
+    await db.commit()
+
+async def claim_outbox(db: AsyncSession, limit: int, lease_seconds: int = 60):
+    # atomically take due rows by pushing next_attempt_at forward (lease);
+    # rows of a crashed sender become due again when the lease runs out
+    now = datetime.utcnow()
+    due = (
+        select(models.OutboxMessage.id)
+        .where(models.OutboxMessage.next_attempt_at <= now)
+        .order_by(models.OutboxMessage.id)
+        .limit(limit)
+    )
     res = await db.execute(
-        select(models.Order).where(models.Order.created_at >= since).order_by(desc(models.Order.created_at))
+        update(models.OutboxMessage)
+        .where(models.OutboxMessage.id.in_(due.scalar_subquery()))
+        .values(next_attempt_at=now + timedelta(seconds=lease_seconds))
+        .returning(
+            models.OutboxMessage.id,
+            models.OutboxMessage.chat_id,
+            models.OutboxMessage.text,
+            models.OutboxMessage.attempts,
+        )
     )
-    return res.scalars().all()
\ No newline at end of file
+    rows = sorted(res.all(), key=lambda r: r.id)
+    await db.commit()
+    return rows
+
+async def finish_outbox(db: AsyncSession, done_ids: list[int], retries: list[dict]):
+    # done_ids: sent or dropped; retries: {"id", "attempts", "next_attempt_at"}
+    if done_ids:
+        await db.execute(delete(models.OutboxMessage).where(models.OutboxMessage.id.in_(done_ids)))
+    if retries:
+        await db.execute(update(models.OutboxMessage), retries)
+    await db.commit()
+
+# ---------- media assets ----------
+async def get_media_assets(db: AsyncSession) -> dict[str, tuple[str, str]]:
+    res = await db.execute(select(models.MediaAsset))
+    return {a.key: (a.source_url, a.file_id) for a in res.scalars()}
+
+async def set_media_asset(db: AsyncSession, key: str, source_url: str, file_id: str):
+    stmt = sqlite_insert(models.MediaAsset).values(key=key, source_url=source_url, file_id=file_id)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[models.MediaAsset.key],
+        set_={"source_url": stmt.excluded.source_url, "file_id": stmt.excluded.file_id},
+    ))
+    await db.commit()
@@ -1,7 +1,26 @@
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+"""
+Demo catalog for a fresh database, and a synthetic data generator for benchmarks,
+load tests and staging:
+
+    python -m app.db.seed --orders 1M [--seed 1] [--users N] [--products N] [--days 730]
+                          [--url sqlite+aiosqlite:///staging.db]
+"""
+import argparse
+import asyncio
+import logging
+import random
+import sys
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+from time import perf_counter
+
+from sqlalchemy import select, insert, bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncConnection
 from app.db import models
 
+log = logging.getLogger("ecombot.seed")
+
 # simple placeholder images (public demo links)
 IMG = {
     "watch_classic":  "https://images.unsplash.com/photo-1511381939415-c1c76de1c0f0",
@@ -96,4 +115,250 @@ async def seed_if_empty(db: AsyncSession):
     ]
 
     db.add_all(products)
-    await db.commit()
\ No newline at end of file
+    await db.commit()
+
+# ---------- synthetic data ----------
+# category -> (nouns, price range)
+CATALOG = {
+    "Watches": (["Watch", "Chronograph", "Smartwatch", "Dive Watch", "Field Watch"], (40, 900)),
+    "Bags": (["Backpack", "Crossbody", "Tote", "Handbag", "Duffel", "Messenger Bag"], (25, 400)),
+    "Sunglasses": (["Aviators", "Wayfarers", "Round Shades", "Sport Shades", "Cat-Eye Sunglasses"], (15, 250)),
+    "Wallets": (["Wallet", "Card Holder", "Zip Wallet", "Money Clip", "Travel Wallet"], (10, 150)),
+    "Belts": (["Belt", "Reversible Belt", "Braided Belt", "Dress Belt", "Canvas Belt"], (12, 120)),
+    "Jewelry": (["Bracelet", "Earrings", "Necklace", "Ring", "Pendant", "Anklet"], (8, 600)),
+    "Scarves": (["Scarf", "Shawl", "Bandana", "Snood"], (10, 140)),
+    "Hats": (["Cap", "Beanie", "Fedora", "Bucket Hat", "Panama Hat"], (10, 110)),
+    "Gloves": (["Gloves", "Mittens", "Driving Gloves", "Touchscreen Gloves"], (12, 130)),
+    "Ties": (["Tie", "Bow Tie", "Knit Tie", "Pocket Square"], (10, 90)),
+    "Keychains": (["Keychain", "Key Ring", "Lanyard", "Key Organizer"], (4, 45)),
+    "Phone Cases": (["Phone Case", "Folio Case", "Card Case", "Bumper"], (8, 70)),
+}
+ADJECTIVES = ["Classic", "Slim", "Vintage", "Urban", "Minimal", "Luxe", "Everyday", "Travel", "Retro",
+              "Sport", "Essential", "Heritage", "Modern", "Signature", "Compact", "Premium"]
+MATERIALS = ["Leather", "Canvas", "Steel", "Suede", "Titanium", "Silver", "Gold", "Cotton", "Wool",
+             "Nylon", "Bamboo", "Vegan Leather", "Ceramic", "Linen"]
+COLORS = ["Black", "Brown", "Tan", "Navy", "Olive", "Grey", "Burgundy", "White", "Sand", "Rose"]
+FIRST_NAMES = ["Ahmed", "Sara", "Omar", "Mona", "Youssef", "Nour", "Karim", "Laila", "Hassan", "Mariam",
+               "Ali", "Salma", "Mostafa", "Hana", "Tarek", "Dina", "Khaled", "Yasmin", "Amr", "Farida"]
+LAST_NAMES = ["Hassan", "Ibrahim", "Mahmoud", "Ali", "Saleh", "Fathy", "Nasser", "Kamal", "Adel",
+              "Youssef", "Farouk", "Shawky", "Mansour", "Zaki", "Sherif"]
+STREETS = ["Tahrir St", "Nile Corniche", "Abbas El Akkad St", "Makram Ebeid St", "Gameat El Dowal St",
+           "El Haram St", "Port Said St", "Salah Salem Rd", "26th of July St", "El Merghany St"]
+PERKS = ["gift box", "free returns", "1 year warranty", "handmade", "limited edition"]
+CITIES = ["Cairo", "Giza", "Alexandria", "Mansoura", "Tanta", "Aswan", "Luxor", "Ismailia"]
+# recent orders are still moving through the statuses; older ones are almost all done
+STATUS_BY_AGE = [  # (max age in days, statuses, weights)
+    (2, ("new", "paid", "shipped"), (6, 3, 1)),
+    (10, ("paid", "shipped", "done"), (2, 5, 3)),
+    (None, ("shipped", "done"), (1, 49)),  # anything older
+]
+BATCH = 20_000
+TG_ID_BASE = 100_000_000  # generated users' Telegram ids start here
+
+class Scale:
+    """Row counts for generate(); anything not given grows with the number of orders."""
+
+    def __init__(self, orders: int, users: int | None = None, products: int | None = None,
+                 categories: int | None = None, carts: int | None = None, days: int = 730):
+        self.orders = orders
+        self.users = users or max(100, orders // 5)
+        self.products = products or min(20_000, max(100, orders // 50))
+        self.categories = min(len(CATALOG), categories or len(CATALOG))
+        self.carts = carts if carts is not None else max(10, self.users // 20)  # users with an open cart
+        self.days = days
+
+def parse_count(raw: str) -> int:
+    # "250" / "100k" / "1.5M"
+    raw = raw.strip()
+    mult = {"k": 1_000, "m": 1_000_000}.get(raw[-1:].lower(), 1)
+    return int(float(raw[:-1] if mult > 1 else raw) * mult)
+
+def _zipf_picker(rng: random.Random, n: int, s: float = 1.1):
+    # 1-based id picker where a few ids are popular (shuffled, so popularity isn't id order)
+    ids = list(range(1, n + 1))
+    rng.shuffle(ids)
+    ids.append(ids[-1])  # bisect can return n when r() * total rounds up to total
+    cum = list(accumulate(1 / (rank ** s) for rank in range(1, n + 1)))
+    total, r = cum[-1], rng.random
+    return lambda: ids[bisect(cum, r() * total)]
+
+def _pick_weighted(rng: random.Random, values: tuple, weights: tuple):
+    cum = list(accumulate(weights))
+    total, r = cum[-1], rng.random
+    return lambda: values[bisect(cum, r() * total)]
+
+def _batched(rows, size: int):
+    it = iter(rows)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+def _insert_sql(conn: AsyncConnection, table, columns: list[str]) -> str:
+    # Core INSERT compiled once; rows then go through the driver's executemany as plain tuples
+    return str(insert(table).values({c: bindparam(c) for c in columns}).compile(dialect=conn.dialect))
+
+async def _bulk(conn: AsyncConnection, table, columns: list[str], rows, batch: int) -> int:
+    sql = _insert_sql(conn, table, columns)
+    n = 0
+    for chunk in _batched(rows, batch):
+        await conn.exec_driver_sql(sql, chunk)
+        n += len(chunk)
+    return n
+
+async def _drop_indexes(conn: AsyncConnection, tables: list[str]) -> list[str]:
+    # bulk loads are much faster with the b-trees built once at the end
+    res = await conn.execute(
+        text("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+             "AND tbl_name IN (" + ",".join(f"'{t}'" for t in tables) + ")")
+    )
+    indexes = res.all()
+    for name, _ in indexes:
+        await conn.exec_driver_sql(f'DROP INDEX "{name}"')
+    return [sql for _, sql in indexes]
+
+async def generate(conn: AsyncConnection, scale: Scale, seed: int = 1, batch: int = BATCH) -> dict[str, int]:
+    """
+    Fill an empty database with a synthetic catalog, users, carts, orders and order items
+    (deterministic for a given scale and seed). Runs inside the caller's transaction;
+    returns row counts per table.
+    """
+    rng = random.Random(seed)
+    r, choice, randint = rng.random, rng.choice, rng.randint
+    counts = {}
+
+    # ----- catalog -----
+    names = list(CATALOG)[:scale.categories]
+    counts["categories"] = await _bulk(conn, models.Category.__table__, ["id", "name"],
+                                       list(enumerate(names, 1)), batch)
+    prices = [0.0]
+
+    def products():
+        for pid in range(1, scale.products + 1):
+            cid = randint(1, len(names))
+            nouns, (lo, hi) = CATALOG[names[cid - 1]]
+            material, color = choice(MATERIALS), choice(COLORS)
+            name = f"{choice(ADJECTIVES)} {material} {choice(nouns)}"
+            price = round(lo + (hi - lo) * r() ** 2.5, 2)  # mostly the cheap end of the range
+            prices.append(price)
+            yield (pid, cid, f"{name}, {color}" if r() < 0.5 else name,
+                   f"{color} {material.lower()}, {choice(PERKS)}.", price,
+                   f"https://picsum.photos/seed/p{pid}/800/800" if r() < 0.6 else None, r() > 0.05)
+
+    counts["products"] = await _bulk(
+        conn, models.Product.__table__,
+        ["id", "category_id", "name", "description", "price", "image_url", "is_active"], products(), batch,
+    )
+
+    # ----- users (most left their details at a checkout) -----
+    def users():
+        for uid in range(1, scale.users + 1):
+            if r() < 0.7:
+                yield (uid, TG_ID_BASE + uid, f"{choice(FIRST_NAMES)} {choice(LAST_NAMES)}",
+                       f"+20 1{choice('0125')}{randint(0, 9)} {randint(100, 999)} {randint(1000, 9999)}",
+                       f"{randint(1, 200)} {choice(STREETS)}, {choice(CITIES)}")
+            else:
+                yield (uid, TG_ID_BASE + uid, None, None, None)
+
+    counts["users"] = await _bulk(conn, models.User.__table__,
+                                  ["id", "tg_id", "name", "phone", "address"], users(), batch)
+
+    popular_product = _zipf_picker(rng, scale.products)
+    active_user = _zipf_picker(rng, scale.users, 0.8)
+    dropped = await _drop_indexes(conn, ["orders", "order_items", "cart_items"])
+
+    def carts():
+        for uid in rng.sample(range(1, scale.users + 1), min(scale.carts, scale.users)):
+            for pid in {popular_product() for _ in range(randint(1, 4))}:
+                yield (uid, pid, 1 if r() < 0.8 else randint(2, 4))
+
+    counts["cart_items"] = await _bulk(conn, models.CartItem.__table__,
+                                       ["user_id", "product_id", "qty"], carts(), batch)
+
+    # ----- orders, oldest first -----
+    # exponent < 1 puts more orders per day near the end (a growing shop)
+    # timestamps are built from per-day and per-second string tables ("YYYY-MM-DD HH:MM:SS",
+    # the CURRENT_TIMESTAMP format); formatting a datetime per order would dominate the loop
+    start = datetime.combine(datetime.utcnow().date() - timedelta(days=scale.days), datetime.min.time())
+    span, n = scale.days * 86400, max(1, scale.orders)
+    dates = [start + timedelta(days=d) for d in range(scale.days + 1)]
+    day_str = [f"{d:%Y-%m-%d} " for d in dates]
+    number_prefix = [f"L-{d:%y%m%d}-" for d in dates]
+    clock = [f"{h:02d}:{m:02d}:{s:02d}" for h in range(24) for m in range(60) for s in range(60)]
+    (fresh_days, fresh), (settling_days, settling), (_, settled) = [
+        (max_age, _pick_weighted(rng, statuses, weights)) for max_age, statuses, weights in STATUS_BY_AGE
+    ]
+
+    # the hot loop (one pass per order): plain arithmetic on r() instead of randint/choice
+    def orders():
+        for oid in range(1, scale.orders + 1):
+            offset = int(span * ((oid - r()) / n) ** 0.7)
+            day, second = divmod(offset, 86400)
+            age = scale.days - 1 - day  # the last day of the history is yesterday
+            status = fresh() if age < fresh_days else settling() if age < settling_days else settled()
+            if r() < 0.55:
+                pids = (popular_product(),)
+            else:
+                pids = {popular_product() for _ in range(2 + int(r() * 4))}
+            lines, total = [], 0.0
+            for pid in pids:
+                qty = 1 if r() < 0.85 else 2 + (r() < 0.5)
+                price = prices[pid]
+                total += qty * price
+                lines.append((oid, pid, qty, price))
+            yield (oid, f"{number_prefix[day]}{oid:X}", active_user(), round(total, 2), status,
+                   day_str[day] + clock[second]), lines
+
+    order_sql = _insert_sql(conn, models.Order.__table__,
+                            ["id", "order_number", "user_id", "total", "status", "created_at"])
+    item_sql = _insert_sql(conn, models.OrderItem.__table__, ["order_id", "product_id", "qty", "price"])
+    counts["orders"] = counts["order_items"] = 0
+    for chunk in _batched(orders(), batch):
+        # orders first: the items reference them
+        items = [line for _, lines in chunk for line in lines]
+        await conn.exec_driver_sql(order_sql, [order for order, _ in chunk])
+        await conn.exec_driver_sql(item_sql, items)
+        counts["orders"] += len(chunk)
+        counts["order_items"] += len(items)
+
+    for sql in dropped:
+        await conn.exec_driver_sql(sql)
+    return counts
+
+async def _main(args) -> int:
+    from app.db.base import Base, make_engine
+    from app.db.migrations import migrate
+
+    scale = Scale(parse_count(args.orders), users=args.users and parse_count(args.users),
+                  products=args.products and parse_count(args.products), categories=args.categories,
+                  days=args.days)
+    engine = make_engine(args.url)
+    try:
+        # schema + data in one transaction
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await migrate(conn)
+            if (await conn.execute(select(models.Category.id).limit(1))).first():
+                log.error("%s already has a catalog; generate into a new database", args.url)
+                return 1
+            t0 = perf_counter()
+            counts = await generate(conn, scale, args.seed, args.batch)
+        log.info("Generated %s in %.1fs", ", ".join(f"{v} {k}" for k, v in counts.items()), perf_counter() - t0)
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql("ANALYZE")  # planner stats for the new data
+    finally:
+        await engine.dispose()
+    return 0
+
+if __name__ == "__main__":
+    from app.core.config import DATABASE_URL
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--orders", default="10k", help="number of orders (accepts 100k, 1M)")
+    ap.add_argument("--users", help="default: orders / 5")
+    ap.add_argument("--products", help="default: orders / 50, between 100 and 20k")
+    ap.add_argument("--categories", type=int, help=f"default: all {len(CATALOG)}")
+    ap.add_argument("--days", type=int, default=730, help="history length")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--batch", type=int, default=BATCH, help="rows per executemany")
+    ap.add_argument("--url", default=DATABASE_URL, help="target database (default: DATABASE_URL)")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+    sys.exit(asyncio.run(_main(ap.parse_args())))
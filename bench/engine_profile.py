@@ -0,0 +1,107 @@
+"""
+Compare the SQLite engine profile against the old defaults on a temp database.
+
+    python -m bench.engine_profile [--seconds 10] [--browsers 32] [--buyers 8] [--dir .]
+
+Runs concurrent browse (category list + product lookup) and checkout
+(add to cart ×2 + create_order) workloads for each profile and prints ops/sec.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+from time import perf_counter
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+
+from app.core.config import DB_PRAGMAS
+from app.db.base import Base, make_engine
+from app.db import repo, models
+from app.db.seed import seed_if_empty
+
+PROFILES = {
+    "legacy": {},           # what base.py used to do: foreign_keys only
+    "tuned": DB_PRAGMAS,    # current env-driven profile
+}
+
+async def _browse(Session, cat_ids, prod_ids, stop, stats):
+    while not stop.is_set():
+        try:
+            async with Session() as db:
+                await repo.list_products_by_category(db, random.choice(cat_ids))
+                await db.get(models.Product, random.choice(prod_ids))
+            stats["browse"] += 1
+        except OperationalError:
+            stats["errors"] += 1
+
+async def _checkout(Session, tg_id, prod_ids, stop, stats):
+    while not stop.is_set():
+        try:
+            async with Session() as db:
+                uid = await repo.get_or_create_user_id(db, tg_id)
+                for pid in random.sample(prod_ids, 2):
+                    await repo.add_to_cart(db, uid, pid)
+                await repo.create_order(db, uid)
+            stats["checkout"] += 1
+        except OperationalError:
+            stats["errors"] += 1
+
+async def run_profile(name: str, pragmas: dict, seconds: float, browsers: int, buyers: int, db_dir: str | None = None) -> dict:
+    fd, path = tempfile.mkstemp(suffix=".db", dir=db_dir)
+    os.close(fd)
+    engine = make_engine(f"sqlite+aiosqlite:///{path}", pragmas=pragmas)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with Session() as db:
+            await seed_if_empty(db)
+            cat_ids = [c.id for c in await repo.list_categories(db)]
+            prod_ids = [p.id for p in await repo.list_products(db)]
+
+        stats = {"browse": 0, "checkout": 0, "errors": 0}
+        stop = asyncio.Event()
+        tasks = [asyncio.create_task(_browse(Session, cat_ids, prod_ids, stop, stats)) for _ in range(browsers)]
+        tasks += [asyncio.create_task(_checkout(Session, 10_000 + i, prod_ids, stop, stats)) for i in range(buyers)]
+        started = perf_counter()
+        await asyncio.sleep(seconds)
+        stop.set()
+        await asyncio.gather(*tasks)
+        elapsed = perf_counter() - started
+    finally:
+        await engine.dispose()
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    return {
+        "profile": name,
+        "browse_per_s": stats["browse"] / elapsed,
+        "checkout_per_s": stats["checkout"] / elapsed,
+        "errors": stats["errors"],
+    }
+
+async def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--browsers", type=int, default=32)
+    ap.add_argument("--buyers", type=int, default=8)
+    ap.add_argument("--dir", default=".", help="where to create the temp DB (use the real data disk)")
+    args = ap.parse_args()
+
+    results = []
+    for name, pragmas in PROFILES.items():
+        results.append(await run_profile(name, pragmas, args.seconds, args.browsers, args.buyers, args.dir))
+
+    print(f"{'profile':<8} {'browse/s':>10} {'checkout/s':>11} {'errors':>7}")
+    for r in results:
+        print(f"{r['profile']:<8} {r['browse_per_s']:>10.1f} {r['checkout_per_s']:>11.1f} {r['errors']:>7}")
+    base, tuned = results[0], results[-1]
+    if base["browse_per_s"] and base["checkout_per_s"]:
+        print(f"browse ×{tuned['browse_per_s'] / base['browse_per_s']:.2f}, "
+              f"checkout ×{tuned['checkout_per_s'] / base['checkout_per_s']:.2f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,262 @@
+"""
+Load-test the real Dispatcher (all routers and middlewares) with simulated users and a fake Bot API.
+
+    python -m bench.loadtest [--users 1000] [--seconds 20] [--mix browse=6,add=2,qty=1,checkout=1]
+                             [--api-latency-ms 30] [--rate-429 0.001] [--orders 100k] [--throttle]
+                             [--dir .] [--json out.json]
+
+Every virtual user loops over scenarios, pressing the buttons the bot actually
+sent back (so edits, keyboards and FSM states are exercised as in production):
+  browse    /shop -> category -> next page -> product -> back to list
+  add       category -> product -> add to cart
+  qty       /cart -> +, +, - on a cart line
+  checkout  add -> checkout -> name -> phone -> shipping -> address -> confirm
+Reports updates/sec, p50/p95/p99 update latency, DB statements per update and
+Bot API calls per update (overall and per scenario).
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import tempfile
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from datetime import datetime
+from time import perf_counter
+
+def _parse_args():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=1000)
+    ap.add_argument("--seconds", type=float, default=20)
+    ap.add_argument("--mix", default="browse=6,add=2,qty=1,checkout=1", help="scenario weights")
+    ap.add_argument("--api-latency-ms", type=float, default=30, help="mean fake Bot API latency (±50%% jitter)")
+    ap.add_argument("--rate-429", type=float, default=0.001, help="share of Bot API calls answered with 429")
+    ap.add_argument("--orders", default="0", help="generate this many orders (and a matching catalog/users) "
+                                                  "instead of the demo catalog, e.g. 100k")
+    ap.add_argument("--throttle", action="store_true", help="keep the per-user throttle at its configured limits")
+    ap.add_argument("--dir", default=".", help="where to create the temp DB (use the real data disk)")
+    ap.add_argument("--json", help="also write the results to this file")
+    return ap.parse_args()
+
+ARGS = _parse_args() if __name__ == "__main__" else None
+if ARGS is not None:
+    # app modules read these at import time
+    fd, DB_PATH = tempfile.mkstemp(suffix=".db", dir=ARGS.dir)
+    os.close(fd)
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+    os.environ.setdefault("BOT_TOKEN", "123456:loadtest")
+    os.environ["METRICS_PORT"] = "0"
+    os.environ["QUERY_BUDGET_MODE"] = "off"
+    if not ARGS.throttle:
+        os.environ["THROTTLE_RATE"] = os.environ["THROTTLE_BURST"] = "1000000"
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.types import Update, Message, CallbackQuery, Chat, User, MessageEntity
+
+from tests.fake_api import FakeApiSession
+
+_api_calls: ContextVar[list[int] | None] = ContextVar("api_calls", default=None)  # per fed update
+
+# ---------- Bot API calls per update ----------
+async def _count_api_call(make_request, bot, method):
+    # bot session middleware: attributes each call to the update being fed
+    per_update = _api_calls.get()
+    if per_update is not None:
+        per_update[0] += 1
+    return await make_request(bot, method)
+
+# ---------- virtual users ----------
+_update_ids = itertools.count(1)
+
+class VirtualUser:
+    def __init__(self, tg_id: int, bot: Bot, api: FakeApiSession, feed, rng: random.Random):
+        self.tg_id, self.bot, self.api, self.feed, self.rng = tg_id, bot, api, feed, rng
+        self.user = User(id=tg_id, is_bot=False, first_name=f"User{tg_id}")
+        self.chat = Chat(id=tg_id, type="private")
+
+    def _message(self, text: str) -> Update:
+        entities = None
+        if text.startswith("/"):
+            entities = [MessageEntity(type="bot_command", offset=0, length=len(text.split()[0]))]
+        msg = Message(message_id=next(_update_ids), date=datetime.now(), chat=self.chat,
+                      from_user=self.user, text=text, entities=entities)
+        return Update(update_id=next(_update_ids), message=msg)
+
+    def buttons(self, prefix: str) -> list[str]:
+        # callback_data of the buttons on the last bot message in this chat
+        msg = self.api.last.get(self.tg_id)
+        markup = msg.reply_markup if msg else None
+        if not markup:
+            return []
+        return [b.callback_data for row in markup.inline_keyboard for b in row
+                if b.callback_data and b.callback_data.startswith(prefix)]
+
+    async def send(self, text: str):
+        await self.feed(self._message(text))
+
+    async def press(self, prefix: str) -> bool:
+        # press a random button starting with prefix on the last bot message
+        options = self.buttons(prefix)
+        if not options:
+            return False
+        msg = self.api.last[self.tg_id]
+        cb = CallbackQuery(id=str(next(_update_ids)), from_user=self.user, chat_instance="load",
+                           message=msg, data=self.rng.choice(options))
+        await self.feed(Update(update_id=next(_update_ids), callback_query=cb))
+        return True
+
+    # ---------- scenarios ----------
+    async def browse(self):
+        await self.send("/shop")
+        await self.press("cat:")
+        await self.press("catp:")
+        await self.press("prod:")
+        await self.press("back:cat:")
+
+    async def add(self):
+        await self.send("/shop")
+        await self.press("cat:")
+        if await self.press("prod:"):
+            await self.press("add:")
+
+    async def qty(self):
+        await self.send("/cart")
+        if not self.buttons("qty:"):
+            await self.add()
+            await self.send("/cart")
+        for sign in "++-":
+            await self.press(f"qty:{sign}:")
+
+    async def checkout(self):
+        await self.add()
+        if not await self.press("checkout"):
+            return
+        await self.send(f"User {self.tg_id}")
+        await self.send("+20 100 123 4567")
+        await self.press("ship:")
+        await self.send("1 Load Test Street")
+        await self.press("co:ok")
+
+# ---------- run ----------
+def _pct(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+async def run(args) -> dict:
+    from app.db.base import init_db, SessionLocal, engine
+    from app.db.seed import seed_if_empty, generate, parse_count, Scale
+    from app.db.profiling import track_queries
+    from app.bot.main import build_dispatcher
+    from app.bot.middlewares.db import ReleaseDbMiddleware
+
+    logging.getLogger("aiogram.event").setLevel(logging.WARNING)  # one INFO line per update otherwise
+    await init_db()
+    orders = parse_count(args.orders)
+    if orders:
+        async with engine.begin() as conn:
+            await generate(conn, Scale(orders))
+    async with SessionLocal() as db:
+        await seed_if_empty(db)
+
+    api = FakeApiSession(args.api_latency_ms / 1000, args.rate_429)
+    bot = Bot("123456:loadtest", session=api, default=DefaultBotProperties(parse_mode="HTML"))
+    bot.session.middleware(ReleaseDbMiddleware())  # as make_bot() does
+    bot.session.middleware(_count_api_call)
+    dp = build_dispatcher(background=False, metrics_port=0)
+    await dp.emit_startup(bot=bot)
+
+    mix = {k: float(v) for k, v in (part.split("=") for part in args.mix.split(","))}
+    names, weights = list(mix), list(mix.values())
+    latencies: dict[str, list[float]] = defaultdict(list)
+    stats: dict[str, Counter] = defaultdict(Counter)
+    errors: Counter[str] = Counter()
+    current: dict[int, str] = {}
+
+    async def feed(update: Update):
+        # statements and API calls are attributed to this update through contextvars,
+        # so concurrent users don't bleed into each other's numbers
+        scenario = current[update.event.from_user.id]
+        calls = [0]
+        token = _api_calls.set(calls)
+        t0 = perf_counter()
+        with track_queries(scenario, None, None, mode="off") as scope:
+            try:
+                await dp.feed_update(bot, update)
+            except Exception as e:
+                errors[type(e).__name__] += 1
+        latencies[scenario].append(perf_counter() - t0)
+        _api_calls.reset(token)
+        s = stats[scenario]
+        s["updates"] += 1
+        s["queries"] += scope.count
+        s["api_calls"] += calls[0]
+
+    stop = perf_counter() + args.seconds
+
+    async def user_loop(vu: VirtualUser):
+        await asyncio.sleep(vu.rng.random())  # spread the first wave
+        while perf_counter() < stop:
+            scenario = vu.rng.choices(names, weights)[0]
+            current[vu.tg_id] = scenario
+            await getattr(vu, scenario)()
+
+    started = perf_counter()
+    await asyncio.gather(*(
+        user_loop(VirtualUser(1_000_000 + i, bot, api, feed, random.Random(i))) for i in range(args.users)
+    ))
+    elapsed = perf_counter() - started
+    await dp.emit_shutdown(bot=bot)
+    await engine.dispose()
+
+    def summary(lat: list[float], s: Counter) -> dict:
+        n = s["updates"] or 1
+        return {
+            "updates": s["updates"],
+            "p50_ms": round(_pct(lat, 50) * 1000, 2),
+            "p95_ms": round(_pct(lat, 95) * 1000, 2),
+            "p99_ms": round(_pct(lat, 99) * 1000, 2),
+            "queries_per_update": round(s["queries"] / n, 2),
+            "api_calls_per_update": round(s["api_calls"] / n, 2),
+        }
+
+    total = sum(stats.values(), Counter())
+    return {
+        "users": args.users,
+        "seconds": round(elapsed, 2),
+        "updates_per_s": round(total["updates"] / elapsed, 1),
+        "overall": summary([x for v in latencies.values() for x in v], total),
+        "scenarios": {k: summary(latencies[k], stats[k]) for k in names if stats[k]["updates"]},
+        "api_calls": dict(api.calls),
+        "errors": dict(errors),
+    }
+
+def _print(r: dict):
+    print(f"{r['users']} users, {r['seconds']}s: {r['updates_per_s']} updates/s")
+    print(f"{'scenario':<10} {'updates':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'db/upd':>7} {'api/upd':>8}")
+    for name, s in [("overall", r["overall"]), *r["scenarios"].items()]:
+        print(f"{name:<10} {s['updates']:>8} {s['p50_ms']:>8} {s['p95_ms']:>8} {s['p99_ms']:>8} "
+              f"{s['queries_per_update']:>7} {s['api_calls_per_update']:>8}")
+    if r["errors"]:
+        print("errors:", r["errors"])
+
+def main():
+    args = ARGS
+    try:
+        result = asyncio.run(run(args))
+    finally:
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(DB_PATH + suffix):
+                os.remove(DB_PATH + suffix)
+    _print(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,450 @@
+"""
+Micro-benchmarks for every function in app/db/repo.py on generated databases.
+
+    python -m bench.repo_bench [--scales 1k,100k,1M] [--time 1.0] [--only orders]
+                               [--dir .bench] [--regen] [--out results.json]
+                               [--baseline old.json] [--threshold 1.25]
+
+Each scale is a number of orders; users, products and order items grow with it
+(app.db.seed.generate). Generated databases are kept in --dir and reused (delete them or pass --regen);
+every run works on a fresh copy, so write benchmarks start from the same state.
+Each benchmark runs on a new session per call, repeated for --time seconds
+(at least --min-iter calls), and reports p50/p95/mean latency and statements per call.
+
+--out writes the results as JSON. --baseline compares p50 against an earlier
+--out file and exits 1 when any benchmark got slower than --threshold times.
+"""
+import argparse
+import asyncio
+import fnmatch
+import inspect
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+from datetime import datetime
+from itertools import count
+from statistics import mean
+from time import perf_counter
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
+
+from app.db.base import Base, make_engine
+from app.db import profiling, repo
+from app.db.migrations import migrate
+from app.db.profiling import track_queries
+from app.db.seed import ADJECTIVES, MATERIALS, TG_ID_BASE, Scale, generate, parse_count
+
+def _label(orders: int) -> str:
+    if orders >= 1_000_000 and orders % 1_000_000 == 0:
+        return f"{orders // 1_000_000}M"
+    if orders >= 1_000 and orders % 1_000 == 0:
+        return f"{orders // 1_000}k"
+    return str(orders)
+
+STATUSES = ("new", "paid", "shipped", "done")
+
+async def build_template(path: str, scale: Scale, seed: int):
+    engine = make_engine(f"sqlite+aiosqlite:///{path}")
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await migrate(conn)
+            await generate(conn, scale, seed)
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql("ANALYZE")
+            await conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        await engine.dispose()
+
+# ---------- benchmarks ----------
+class Ctx:
+    """Random ids that exist in the generated database."""
+
+    def __init__(self, scale: Scale, seed: int):
+        self.scale = scale
+        self.rng = random.Random(seed)
+        self.seq = count(1)
+
+    def user(self) -> int:
+        return self.rng.randint(1, self.scale.users)
+
+    def tg_id(self) -> int:
+        return TG_ID_BASE + self.user()
+
+    def product(self) -> int:
+        return self.rng.randint(1, self.scale.products)
+
+    def products(self, n: int) -> list[int]:
+        return self.rng.sample(range(1, self.scale.products + 1), n)
+
+    def category(self) -> int:
+        return self.rng.randint(1, self.scale.categories)
+
+    def order(self) -> int:
+        return self.rng.randint(1, self.scale.orders)
+
+    def status(self) -> str:
+        return self.rng.choice(STATUSES)
+
+# name -> setup(db, ctx) returning the zero-argument coroutine function that is timed
+BENCHES = {}
+
+def bench(name: str):
+    def deco(setup):
+        BENCHES[name] = setup
+        return setup
+    return deco
+
+async def _cart_line(db, ctx) -> int:
+    item = await repo.add_to_cart(db, ctx.user(), ctx.product())
+    return item.id
+
+# categories
+@bench("list_categories")
+async def _(db, ctx):
+    return lambda: repo.list_categories(db)
+
+@bench("create_category")
+async def _(db, ctx):
+    name = f"Bench category {next(ctx.seq)}"
+    return lambda: repo.create_category(db, name)
+
+# products
+@bench("list_products")
+async def _(db, ctx):
+    return lambda: repo.list_products(db)
+
+@bench("list_products_admin_page")
+async def _(db, ctx):
+    cursor = ctx.product()
+    return lambda: repo.list_products_admin_page(db, cursor_id=cursor)
+
+@bench("count_products")
+async def _(db, ctx):
+    return lambda: repo.count_products(db)
+
+@bench("list_products_by_category")
+async def _(db, ctx):
+    cid = ctx.category()
+    return lambda: repo.list_products_by_category(db, cid)
+
+@bench("list_products_page")
+async def _(db, ctx):
+    cid = ctx.category()
+    rows, _ = await repo.list_products_page(db, cid)
+    cursor = rows[-1].id if rows else None
+    return lambda: repo.list_products_page(db, cid, cursor_id=cursor)
+
+@bench("search_products")
+async def _(db, ctx):
+    query = f"{ctx.rng.choice(ADJECTIVES)} {ctx.rng.choice(MATERIALS)[:3]}"
+    return lambda: repo.search_products(db, query)
+
+@bench("rebuild_search_index")
+async def _(db, ctx):
+    return lambda: repo.rebuild_search_index(db)
+
+@bench("list_products_without_photo")
+async def _(db, ctx):
+    return lambda: repo.list_products_without_photo(db)
+
+@bench("create_product")
+async def _(db, ctx):
+    cid, n = ctx.category(), next(ctx.seq)
+    return lambda: repo.create_product(db, cid, f"Bench product {n}", 9.99, "bench")
+
+@bench("update_product_fields")
+async def _(db, ctx):
+    pid, price = ctx.product(), round(ctx.rng.uniform(5, 300), 2)
+    return lambda: repo.update_product_fields(db, pid, price=price)
+
+@bench("delete_product")
+async def _(db, ctx):
+    p = await repo.create_product(db, ctx.category(), f"Bench doomed {next(ctx.seq)}", 1.0)
+    return lambda: repo.delete_product(db, p.id)
+
+@bench("set_product_photo_file_id")
+async def _(db, ctx):
+    pid, file_id = ctx.product(), f"bench-file-{next(ctx.seq)}"
+    return lambda: repo.set_product_photo_file_id(db, pid, file_id)
+
+@bench("store_product_file_id")
+async def _(db, ctx):
+    pid, file_id = ctx.product(), f"bench-file-{next(ctx.seq)}"
+    return lambda: repo.store_product_file_id(db, pid, file_id)
+
+@bench("list_products_to_warm")
+async def _(db, ctx):
+    return lambda: repo.list_products_to_warm(db)
+
+# users
+@bench("get_or_create_user")
+async def _(db, ctx):
+    tg_id = ctx.tg_id()
+    return lambda: repo.get_or_create_user(db, tg_id)
+
+@bench("get_or_create_user_id")
+async def _(db, ctx):
+    tg_id = ctx.tg_id()
+    return lambda: repo.get_or_create_user_id(db, tg_id)
+
+@bench("get_or_create_user_id (new)")
+async def _(db, ctx):
+    tg_id = 1_000_000_000 + next(ctx.seq)
+    return lambda: repo.get_or_create_user_id(db, tg_id)
+
+@bench("update_user_details")
+async def _(db, ctx):
+    tg_id = ctx.tg_id()
+    return lambda: repo.update_user_details(db, tg_id, "Bench User", "+20 100 000 0000", "1 Bench Street")
+
+@bench("update_user_details_by_id")
+async def _(db, ctx):
+    uid = ctx.user()
+    return lambda: repo.update_user_details_by_id(db, uid, "Bench User", "+20 100 000 0000", "1 Bench Street")
+
+# cart
+@bench("add_to_cart")
+async def _(db, ctx):
+    uid, pid = ctx.user(), ctx.product()
+    return lambda: repo.add_to_cart(db, uid, pid)
+
+@bench("get_cart")
+async def _(db, ctx):
+    uid = ctx.user()
+    return lambda: repo.get_cart(db, uid)
+
+@bench("get_cart_view")
+async def _(db, ctx):
+    uid = ctx.user()
+    return lambda: repo.get_cart_view(db, uid)
+
+@bench("change_qty")
+async def _(db, ctx):
+    item_id = await _cart_line(db, ctx)
+    return lambda: repo.change_qty(db, item_id, 1)
+
+@bench("remove_item")
+async def _(db, ctx):
+    item_id = await _cart_line(db, ctx)
+    return lambda: repo.remove_item(db, item_id)
+
+@bench("clear_cart")
+async def _(db, ctx):
+    uid = ctx.user()
+    for pid in ctx.products(3):
+        await repo.add_to_cart(db, uid, pid)
+    return lambda: repo.clear_cart(db, uid)
+
+# orders
+@bench("create_order")
+async def _(db, ctx):
+    uid = ctx.user()
+    for pid in ctx.products(2):
+        await repo.add_to_cart(db, uid, pid)
+    return lambda: repo.create_order(db, uid)
+
+@bench("list_orders")
+async def _(db, ctx):
+    return lambda: repo.list_orders(db)
+
+@bench("list_orders_by_status")
+async def _(db, ctx):
+    status = ctx.status()
+    return lambda: repo.list_orders_by_status(db, status)
+
+@bench("list_orders_page")
+async def _(db, ctx):
+    status, cursor = ctx.status(), ctx.order()
+    return lambda: repo.list_orders_page(db, status, cursor_id=cursor)
+
+@bench("count_orders")
+async def _(db, ctx):
+    status = ctx.status()
+    return lambda: repo.count_orders(db, status)
+
+@bench("get_order_with_items")
+async def _(db, ctx):
+    oid = ctx.order()
+    return lambda: repo.get_order_with_items(db, oid)
+
+@bench("set_order_status")
+async def _(db, ctx):
+    oid, status = ctx.order(), ctx.status()
+    return lambda: repo.set_order_status(db, oid, status)
+
+@bench("list_orders_last_days")
+async def _(db, ctx):
+    return lambda: repo.list_orders_last_days(db, 30)
+
+# outbox
+@bench("enqueue_messages")
+async def _(db, ctx):
+    messages = [(ctx.tg_id(), "Your order was shipped") for _ in range(10)]
+    return lambda: repo.enqueue_messages(db, messages)
+
+@bench("claim_outbox")
+async def _(db, ctx):
+    await repo.enqueue_messages(db, [(ctx.tg_id(), "bench") for _ in range(50)])
+    return lambda: repo.claim_outbox(db, 50)
+
+@bench("finish_outbox")
+async def _(db, ctx):
+    await repo.enqueue_messages(db, [(ctx.tg_id(), "bench") for _ in range(50)])
+    rows = await repo.claim_outbox(db, 50)
+    done = [r.id for r in rows[:40]]
+    retries = [{"id": r.id, "attempts": r.attempts + 1, "next_attempt_at": datetime.utcnow()} for r in rows[40:]]
+    return lambda: repo.finish_outbox(db, done, retries)
+
+# media assets
+@bench("get_media_assets")
+async def _(db, ctx):
+    return lambda: repo.get_media_assets(db)
+
+@bench("set_media_asset")
+async def _(db, ctx):
+    n = next(ctx.seq)
+    return lambda: repo.set_media_asset(db, f"bench{n % 20}", f"https://example.com/{n}.jpg", f"file{n}")
+
+def uncovered() -> list[str]:
+    # public repo coroutines without a benchmark (variants like "x (new)" count for x)
+    covered = {name.split(" ")[0] for name in BENCHES}
+    return sorted(
+        name for name, fn in inspect.getmembers(repo, inspect.iscoroutinefunction)
+        if not name.startswith("_") and fn.__module__ == repo.__name__ and name not in covered
+    )
+
+# ---------- run ----------
+def _pct(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+async def run_scale(template: str, work: str, scale: Scale, names: list[str], seconds: float,
+                    min_iter: int, max_iter: int, seed: int) -> dict:
+    shutil.copyfile(template, work)
+    engine = make_engine(f"sqlite+aiosqlite:///{work}")
+    profiling.install(engine)
+    Session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    ctx = Ctx(scale, seed)
+    results = {}
+    try:
+        for name in names:
+            setup = BENCHES[name]
+            times, queries = [], []
+            deadline = perf_counter() + seconds
+            for i in range(max_iter + 1):
+                async with Session() as db:
+                    call = await setup(db, ctx)
+                    with track_queries(name, None, None, mode="off") as scope:
+                        t0 = perf_counter()
+                        await call()
+                        dt = perf_counter() - t0
+                if i == 0:
+                    continue  # warm-up: statement cache, page cache
+                times.append(dt)
+                queries.append(scope.count)
+                if len(times) >= min_iter and perf_counter() > deadline:
+                    break
+            results[name] = {
+                "n": len(times),
+                "p50_ms": round(_pct(times, 50) * 1000, 3),
+                "p95_ms": round(_pct(times, 95) * 1000, 3),
+                "mean_ms": round(mean(times) * 1000, 3),
+                "queries": round(mean(queries), 2),
+            }
+            print(f"  {name:<32} {results[name]['p50_ms']:>10.3f} {results[name]['p95_ms']:>10.3f} "
+                  f"{results[name]['queries']:>8} {results[name]['n']:>6}", flush=True)
+    finally:
+        await engine.dispose()
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(work + suffix):
+                os.remove(work + suffix)
+    return results
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Print p50 ratios against a baseline; returns the benchmarks slower than `threshold`×."""
+    regressions = []
+    print(f"\n{'scale':<6} {'benchmark':<32} {'base ms':>10} {'now ms':>10} {'ratio':>7}")
+    for scale, benches in current["results"].items():
+        base = baseline.get("results", {}).get(scale, {})
+        for name, r in benches.items():
+            if name not in base:
+                continue
+            old, new = base[name]["p50_ms"], r["p50_ms"]
+            ratio = new / old if old else float("inf")
+            flag = ""
+            if ratio > threshold:
+                flag = "  SLOWER"
+                regressions.append(f"{scale} {name}")
+            elif ratio < 1 / threshold:
+                flag = "  faster"
+            print(f"{scale:<6} {name:<32} {old:>10.3f} {new:>10.3f} {ratio:>7.2f}{flag}")
+    return regressions
+
+async def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scales", default="1k,100k,1M", help="comma-separated order counts")
+    ap.add_argument("--time", type=float, default=1.0, help="seconds per benchmark")
+    ap.add_argument("--min-iter", type=int, default=5)
+    ap.add_argument("--max-iter", type=int, default=1000)
+    ap.add_argument("--only", action="append", help="glob(s) on benchmark names, e.g. '*order*'")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--dir", default=".bench", help="where generated databases are kept")
+    ap.add_argument("--regen", action="store_true", help="rebuild the generated databases")
+    ap.add_argument("--out", help="write results as JSON")
+    ap.add_argument("--baseline", help="JSON from an earlier --out to compare against")
+    ap.add_argument("--threshold", type=float, default=1.25, help="p50 ratio that counts as a regression")
+    args = ap.parse_args()
+
+    names = [n for n in BENCHES if not args.only or any(fnmatch.fnmatch(n, p) for p in args.only)]
+    missing = uncovered()
+    if missing:
+        print(f"warning: no benchmark for {', '.join(missing)}", file=sys.stderr)
+    os.makedirs(args.dir, exist_ok=True)
+
+    output = {
+        "meta": {
+            "created": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "machine": platform.machine(),
+            "seed": args.seed,
+            "time": args.time,
+        },
+        "results": {},
+    }
+    for raw in args.scales.split(","):
+        scale = Scale(parse_count(raw))
+        label = _label(scale.orders)
+        template = os.path.join(args.dir, f"orders_{label}_seed{args.seed}.db")
+        if args.regen or not os.path.exists(template):
+            print(f"generating {label} orders -> {template}", flush=True)
+            t0 = perf_counter()
+            if os.path.exists(template):
+                os.remove(template)
+            await build_template(template, scale, args.seed)
+            print(f"  done in {perf_counter() - t0:.1f}s", flush=True)
+        print(f"\n{label} orders ({scale.users} users, {scale.products} products)")
+        print(f"  {'benchmark':<32} {'p50 ms':>10} {'p95 ms':>10} {'queries':>8} {'n':>6}")
+        output["results"][label] = await run_scale(
+            template, os.path.join(args.dir, f"work_{label}.db"), scale, names,
+            args.time, args.min_iter, args.max_iter, args.seed,
+        )
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(output, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(output, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,132 @@
+import asyncio
+import itertools
+import os
+import tempfile
+from datetime import datetime
+
+import pytest
+
+# a throwaway database for the whole run; app modules read these at import time
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='ecombot-tests-')}/test.db"
+os.environ.setdefault("BOT_TOKEN", "123456:test")
+os.environ["METRICS_PORT"] = "0"
+os.environ["ADMIN_IDS"] = "42"
+os.environ["QUERY_BUDGET_MODE"] = "raise"  # HANDLER_BUDGETS fail the update instead of logging
+os.environ["THROTTLE_RATE"] = os.environ["THROTTLE_BURST"] = "1000000"
+
+from aiogram import Bot
+from aiogram.types import Update, Message, CallbackQuery, Chat, User, MessageEntity
+
+from app.core.config import QUERY_REPEAT_LIMIT
+from app.db.profiling import track_queries
+from tests.fake_api import FakeApiSession
+
+@pytest.fixture
+def run():
+    # run a coroutine on a fresh loop; pooled connections belong to that loop, so drop them after
+    from app.db.base import engine
+
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await engine.dispose()
+        return asyncio.run(main())
+    return run
+
+@pytest.fixture
+def query_budget(request):
+    """
+    with query_budget(4) as q:
+        await shop.press("add:1")
+
+    Fails with QueryBudgetExceeded when the block runs more than the given number of
+    statements, or repeats one statement shape more than `repeat_limit` times (N+1).
+    """
+    def budget(max_queries: int | None, repeat_limit: int | None = QUERY_REPEAT_LIMIT):
+        return track_queries(request.node.name, max_queries, repeat_limit, mode="raise")
+    return budget
+
+# ---------- the bot against a fake Bot API ----------
+_ids = itertools.count(1)
+_users = itertools.count(1_000)
+_dp = None
+
+def _dispatcher():
+    # the routers are module-level and attach to one dispatcher only; tests use new users
+    global _dp
+    if _dp is None:
+        from app.bot.main import build_dispatcher
+        _dp = build_dispatcher(background=False, metrics_port=0)
+    return _dp
+
+class Shop:
+    """The real dispatcher (all routers and middlewares) fed updates from one user."""
+
+    def __init__(self):
+        from app.bot.middlewares.db import ReleaseDbMiddleware
+
+        self.api = FakeApiSession()
+        self.bot = Bot("123456:test", session=self.api)
+        self.bot.session.middleware(ReleaseDbMiddleware())
+        self.dp = _dispatcher()
+        self.tg_id = next(_users)
+        self.user = User(id=self.tg_id, is_bot=False, first_name="Test")
+        self.chat = Chat(id=self.tg_id, type="private")
+        self.category_id: int | None = None
+        self.product_ids: list[int] = []
+
+    async def __aenter__(self):
+        from app.db.base import SessionLocal, init_db
+        from app.db.cache import catalog
+        from app.db import models
+
+        await init_db()
+        async with SessionLocal() as db:
+            cat = models.Category(name=f"Category {self.tg_id}")
+            db.add(cat)
+            await db.flush()
+            products = [
+                models.Product(category_id=cat.id, name=f"Product {i}", price=10 + i,
+                               image_url=f"https://example.com/{self.tg_id}/{i}.jpg")
+                for i in range(3)
+            ]
+            db.add_all(products)
+            await db.commit()
+            self.category_id, self.product_ids = cat.id, [p.id for p in products]
+        catalog.invalidate()  # start every test from a cold catalog cache
+        await self.dp.emit_startup(bot=self.bot)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.dp.emit_shutdown(bot=self.bot)
+
+    @property
+    def last(self) -> Message | None:
+        # the last message the bot sent or edited in this chat
+        return self.api.last.get(self.tg_id)
+
+    def buttons(self, prefix: str = "") -> list[str]:
+        markup = self.last.reply_markup if self.last else None
+        if not markup:
+            return []
+        return [b.callback_data for row in markup.inline_keyboard for b in row
+                if b.callback_data and b.callback_data.startswith(prefix)]
+
+    async def send(self, text: str):
+        entities = None
+        if text.startswith("/"):
+            entities = [MessageEntity(type="bot_command", offset=0, length=len(text.split()[0]))]
+        msg = Message(message_id=next(_ids), date=datetime.now(), chat=self.chat,
+                      from_user=self.user, text=text, entities=entities)
+        await self.dp.feed_update(self.bot, Update(update_id=next(_ids), message=msg))
+
+    async def press(self, data: str):
+        cb = CallbackQuery(id=str(next(_ids)), from_user=self.user, chat_instance="test",
+                           message=self.last, data=data)
+        await self.dp.feed_update(self.bot, Update(update_id=next(_ids), callback_query=cb))
+
+@pytest.fixture
+def shop():
+    return Shop
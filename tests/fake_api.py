@@ -0,0 +1,58 @@
+"""
+Fake Bot API session shared by the tests and bench/loadtest.py: every call is
+answered locally, so the real dispatcher runs without Telegram.
+"""
+import asyncio
+import itertools
+import random
+from collections import Counter
+from datetime import datetime
+
+from aiogram.client.session.base import BaseSession
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import GetMe, SendPhoto, EditMessageMedia
+from aiogram.types import Message, Chat, User, PhotoSize
+
+class FakeApiSession(BaseSession):
+    """Answers every Bot API call locally after a random delay; remembers what each chat last got."""
+
+    def __init__(self, latency: float = 0, rate_429: float = 0):
+        super().__init__()
+        self.latency, self.rate_429 = latency, rate_429
+        self.calls: Counter[str] = Counter()
+        self.last: dict[int, Message] = {}   # chat id -> last message the bot sent or edited
+        self._ids = itertools.count(1)
+
+    async def make_request(self, bot, method, timeout=None):
+        name = method.__api_method__
+        self.calls[name] += 1
+        if self.latency:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * self.latency)
+        if random.random() < self.rate_429:
+            self.calls["429"] += 1
+            raise TelegramRetryAfter(method=method, message="Too Many Requests: retry after 1", retry_after=1)
+        if isinstance(method, GetMe):
+            return User(id=bot.id, is_bot=True, first_name="Shop", username="loadtest_bot")
+        if name.startswith(("send", "edit")):
+            chat_id = getattr(method, "chat_id", None) or 0
+            photo = None
+            if isinstance(method, (SendPhoto, EditMessageMedia)):
+                photo = [PhotoSize(file_id=f"file{next(self._ids)}", file_unique_id="u", width=800, height=800)]
+            msg = Message(
+                message_id=getattr(method, "message_id", None) or next(self._ids),
+                date=datetime.now(),
+                chat=Chat(id=chat_id, type="private"),
+                text=None if photo else getattr(method, "text", None),
+                caption=getattr(getattr(method, "media", method), "caption", None) if photo else None,
+                photo=photo,
+                reply_markup=getattr(method, "reply_markup", None),
+            ).as_(bot)
+            self.last[chat_id] = msg
+            return msg
+        return True
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def close(self):
+        pass
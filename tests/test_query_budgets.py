@@ -0,0 +1,106 @@
+from app.bot.middlewares.querybudget import HANDLER_BUDGETS
+
+# Statement counts per update through the real dispatcher (FSM storage, identity
+# lookup and handler together). Tighter than HANDLER_BUDGETS, which the bot also
+# enforces here (QUERY_BUDGET_MODE=raise in conftest.py).
+
+def test_catalog_browsing(run, shop, query_budget):
+    async def scenario():
+        async with shop() as s:
+            # first update of a new user: user row, FSM state, categories, banner file_id
+            with query_budget(6):
+                await s.send("/shop")
+            with query_budget(1):
+                await s.press(f"cat:{s.category_id}")
+            # product lookup + storing the file_id Telegram returned for the URL image
+            with query_budget(2):
+                await s.press(f"prod:{s.product_ids[0]}")
+            assert s.last.photo
+
+            # everything again from the warm caches
+            for step in (s.send("/shop"), s.press(f"cat:{s.category_id}"),
+                         s.press(f"prod:{s.product_ids[0]}"), s.press(f"back:cat:{s.category_id}")):
+                with query_budget(0):
+                    await step
+    run(scenario())
+
+def test_cart(run, shop, query_budget):
+    async def scenario():
+        async with shop() as s:
+            await s.send("/shop")
+            for pid in s.product_ids:
+                with query_budget(HANDLER_BUDGETS["cart.on_add_to_cart"]) as q:
+                    await s.press(f"add:{pid}")
+                assert q.count == 1  # one upsert
+            # one joined query however many lines the cart has (no N+1)
+            with query_budget(1):
+                await s.send("/cart")
+            assert len(s.buttons("rm:")) == len(s.product_ids)
+            with query_budget(2):
+                await s.press(s.buttons("qty:+")[0])
+            with query_budget(2):
+                await s.press(s.buttons("rm:")[0])
+            assert len(s.buttons("rm:")) == len(s.product_ids) - 1
+    run(scenario())
+
+def test_checkout(run, shop, query_budget):
+    async def scenario():
+        from sqlalchemy import select, func
+        from app.db.base import SessionLocal
+        from app.db import models
+
+        async with shop() as s:
+            await s.send("/shop")
+            await s.press(f"add:{s.product_ids[0]}")
+            await s.press(f"add:{s.product_ids[1]}")
+            await s.send("/cart")
+            # each step: FSM read + write
+            with query_budget(3):
+                await s.press("checkout")
+            for text in ("Test User", "+20 100 123 4567"):
+                with query_budget(2):
+                    await s.send(text)
+            with query_budget(2):
+                await s.press("ship:courier")
+            with query_budget(2):
+                await s.send("1 Test Street")
+            # user details, cart snapshot, order, items, emptied cart, admin alert, FSM
+            with query_budget(8):
+                await s.press("co:ok")
+            assert s.last.text.startswith("✅ Order placed!")
+
+        async with SessionLocal() as db:
+            user_id = (await db.execute(
+                select(models.User.id).where(models.User.tg_id == s.tg_id))).scalar_one()
+            order = (await db.execute(
+                select(models.Order).where(models.Order.user_id == user_id))).scalar_one()
+            items = (await db.execute(
+                select(func.count()).where(models.OrderItem.order_id == order.id))).scalar_one()
+            alerts = (await db.execute(
+                select(func.count()).where(models.OutboxMessage.text.contains(order.order_number)))).scalar_one()
+            cart = (await db.execute(
+                select(func.count()).where(models.CartItem.user_id == user_id))).scalar_one()
+        assert (items, alerts, cart) == (2, 1, 0)
+    run(scenario())
+
+def test_order_status_notifies_in_one_transaction(run, shop, query_budget):
+    async def scenario():
+        from sqlalchemy import select
+        from app.db.base import SessionLocal
+        from app.db import models, repo
+
+        async with shop() as s:
+            await s.send("/shop")
+            await s.press(f"add:{s.product_ids[0]}")
+            async with SessionLocal() as db:
+                user_id = (await db.execute(
+                    select(models.User.id).where(models.User.tg_id == s.tg_id))).scalar_one()
+                order = await repo.create_order(db, user_id)
+                # order, customer's tg_id, outbox row, refresh
+                with query_budget(5):
+                    await repo.set_order_status(
+                        db, order.id, "shipped", notify=lambda o, tg_id: [(tg_id, f"{o.order_number}: {o.status}")])
+                texts = (await db.execute(
+                    select(models.OutboxMessage.text).where(models.OutboxMessage.chat_id == s.tg_id))).scalars().all()
+        assert texts == [f"{order.order_number}: shipped"]
+    run(scenario())
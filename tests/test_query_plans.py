@@ -0,0 +1,19 @@
+from app.db.base import engine, init_db
+from app.db.migrations import explain_hot_queries, full_scans
+
+HOT_TABLES = ("products", "orders", "cart_items")
+
+def test_hot_queries_use_indexes(run):
+    # the plans of the statements repo.py actually builds (see migrations.hot_queries)
+    async def plans():
+        await init_db()
+        async with engine.connect() as conn:
+            return await explain_hot_queries(conn)
+
+    plans = run(plans())
+    table_scans = [
+        (name, line) for name, lines in plans.items() for line in lines
+        if line.startswith("SCAN ") and line.split()[1] in HOT_TABLES and "USING" not in line
+    ]
+    assert not table_scans
+    assert not full_scans(plans)
@@ -0,0 +1,18 @@
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+
+from app.bot.storage import SqliteStorage
+from app.db.base import init_db
+
+def test_fsm_cache_rereads_after_cache_ttl(run):
+    async def scenario():
+        await init_db()
+        key = StorageKey(bot_id=1, chat_id=77, user_id=77)
+        mine, other = SqliteStorage(cache_ttl=0.05), SqliteStorage()
+        assert await mine.get_state(key) is None     # "no state" is cached now
+        await other.set_state(key, "CheckoutStates:name")  # written by another instance
+        assert await mine.get_state(key) is None     # still within cache_ttl
+        await asyncio.sleep(0.1)
+        assert await mine.get_state(key) == "CheckoutStates:name"
+    run(scenario())